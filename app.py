@@ -1,10 +1,30 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
+import numpy as np
 import time
 import os
+import hashlib
+
+from pagination import (
+    KeysetPager, bucket_width, bucketed_averages, bucketed_totals, build_where, count_rows, epoch_bounds,
+    get_columns, latest_id, time_bounds,
+)
+from setup_db import migrate_db
+from staleness import DEFAULT_MAX_MISSED, StalenessTracker, gap_segments
+from hotstore import HOTSTORE_PATH, METRICS, HotStore
+from federation import fleet_summary, load_sites, quantile, Federation
+from leaderboard import LABELS, ROLLING_SAMPLES, Leaderboard
+import reports
+import correlation
+import blockstore
+
+# The hot store is re-synced from log.db at most this often (across all sessions)
+HOT_SYNC_SECONDS = 30
+REPORT_SYNC_SECONDS = 60
 
 DB_NAME = "log.db"
+FLEET_VIEW = "🌍 All sites (fleet)"
 
 st.set_page_config(page_title="Data Center Monitoring System", layout="wide")
 
@@ -181,6 +201,197 @@ if "memory_threshold" not in st.session_state:
 if "disk_threshold" not in st.session_state:
     st.session_state.disk_threshold = 90
 
+@st.cache_resource
+def _migrate_db(db_name):
+    # Runs once per server process; adds the host column and indexes if missing
+    try:
+        conn = sqlite3.connect(db_name)
+        migrate_db(conn)
+        conn.close()
+    except sqlite3.Error:
+        pass
+    return True
+
+@st.cache_resource
+def _staleness_tracker(db_name):
+    # Shared by all sessions; each rerun only reads rows added since the last one
+    return StalenessTracker()
+
+@st.cache_resource
+def _hot_store(db_name):
+    # One ring buffer file per site database. Sites are told apart by their full
+    # path (dc1/log.db and dc2/log.db share a file name); log.db itself keeps the
+    # file `cli.py hotsync` feeds
+    db_path = os.path.abspath(db_name)
+    if db_path == os.path.abspath(DB_NAME):
+        return HotStore()
+    digest = hashlib.sha1(db_path.encode("utf-8")).hexdigest()[:16]
+    return HotStore(f"{HOTSTORE_PATH}.{digest}")
+
+def hot_store(db_name):
+    """Shared in-memory store of recent samples; only syncs from SQLite when stale."""
+    store = _hot_store(db_name)
+    if store.age() > HOT_SYNC_SECONDS:
+        conn = sqlite3.connect(db_name)
+        try:
+            store.sync(conn)
+        finally:
+            conn.close()
+    return store
+
+@st.cache_resource
+def _leaderboard(db_name):
+    # Shared by all sessions; each rerun only feeds rows added since the last one
+    return Leaderboard()
+
+@st.cache_resource
+def _report_sync(db_name):
+    # Time of the last materialize() per database, shared by all sessions
+    return {"at": 0.0}
+
+def report_conn(db_name):
+    """Connection with the reports table brought up to date (at most every REPORT_SYNC_SECONDS)."""
+    if not os.path.exists(db_name):
+        raise FileNotFoundError(f"Database not found: {db_name}")
+    conn = sqlite3.connect(db_name)
+    sync = _report_sync(db_name)
+    if time.time() - sync["at"] > REPORT_SYNC_SECONDS:
+        reports.materialize(conn)
+        sync["at"] = time.time()
+    return conn
+
+def report_df(report):
+    return pd.DataFrame(reports.report_table(report), columns=["Metric", "Value"])
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _correlations(db_name, window, end):
+    # Keyed by the window's end bucket: reruns and other sessions reuse the
+    # result until a new bucket opens (cache_resource avoids copying the matrix)
+    conn = sqlite3.connect(db_name)
+    try:
+        return correlation.analyze(conn, window, end=end)
+    finally:
+        conn.close()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _fleet_summary(sites, thresholds):
+    # Fans out to every site in parallel; cached briefly so reruns don't re-query
+    return fleet_summary(Federation(list(sites)), dict(thresholds))
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _networking_overview(db_name, where, params, alert_where, alert_params, chart_cols, packed_filter=None):
+    # SQL aggregates instead of the whole table; cached so page turns (reruns) reuse them.
+    # packed_filter = (start, end, cpu threshold) lets samples packed into metric_blocks
+    # count too; None when the filters need columns the blocks don't keep
+    conn = sqlite3.connect(db_name)
+    try:
+        packed = blockstore.packed_through(conn) if packed_filter else None
+        if packed is None:
+            total = count_rows(conn)
+            alert_count = count_rows(conn, alert_where, alert_params)
+            buckets = bucketed_averages(conn, chart_cols, where, params)
+        else:
+            total, alert_count, buckets = _packed_overview(
+                conn, packed, where, params, alert_where, alert_params, chart_cols, *packed_filter
+            )
+    finally:
+        conn.close()
+    chart_df = pd.DataFrame(buckets, columns=["timestamp", *chart_cols])
+    chart_df["timestamp"] = pd.to_datetime(chart_df["timestamp"], unit="s")
+    return total, alert_count, chart_df.set_index("timestamp")
+
+def _packed_overview(conn, packed, where, params, alert_where, alert_params, chart_cols, start, end, cpu_threshold):
+    """Networking's counts and chart over both stores: metric_blocks for samples up
+    to `packed`, system_log for the rest (pack --prune may have removed the former)."""
+    tail = blockstore.row_store_filter(packed)
+
+    def unpacked(w, p):
+        return build_where(([(w[len("WHERE "):], p)] if w else []) + [tail])
+
+    total = blockstore.count_packed(conn) + count_rows(conn, *unpacked("", ()))
+    alert_count = (blockstore.count_packed(conn, "cpu", above=cpu_threshold)
+                   + count_rows(conn, *unpacked(alert_where, alert_params)))
+
+    tail_where, tail_params = unpacked(where, params)
+    bounds = [b for b in (blockstore.time_bounds(conn, start, end), epoch_bounds(conn, tail_where, tail_params))
+              if b[0] is not None]
+    if not bounds:
+        return total, alert_count, []
+    first, last = min(b[0] for b in bounds), max(b[1] for b in bounds)
+    width = bucket_width(first, last)
+    # Buckets on multiples of width, as bucketed_averages() draws them
+    first = first // width * width
+    n_buckets = (last - first) // width + 1
+    sums, counts = blockstore.bucket_totals(
+        conn, chart_cols, first, width, n_buckets, start, end, "cpu", cpu_threshold
+    )
+    tail_sums, tail_counts = bucketed_totals(conn, chart_cols, tail_where, tail_params, first, width, n_buckets)
+    sums, counts = sums + tail_sums, counts + tail_counts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = np.where(counts > 0, sums / counts, np.nan)
+    return total, alert_count, [
+        (first + i * width, *[None if np.isnan(v) else float(v) for v in averages[:, i]])
+        for i in np.flatnonzero(counts.any(axis=0))
+    ]
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _gap_segments(db_name, start=None, end=None):
+    # Scans the whole date range; cached so page turns on Networking don't repeat it
+    conn = sqlite3.connect(db_name)
+    try:
+        return gap_segments(conn, start, end)
+    finally:
+        conn.close()
+
+@st.fragment
+def paginated_table(key, where="", params=(), db_name=DB_NAME):
+    """Renders one page of system_log rows, paged and sorted server-side.
+
+    A fragment: paging and sorting rerun only the table, not the page around it.
+    """
+    sort_order = st.selectbox(
+        "Sort by timestamp", ["Newest first", "Oldest first"], key=f"{key}_sort"
+    )
+    conn = sqlite3.connect(db_name)
+    try:
+        # New rows, a pack (which may prune rows) or a recreated log.db start a
+        # fresh pager, so the record count and page boundaries are never stale
+        signature = (
+            db_name, where, tuple(params), sort_order == "Newest first",
+            latest_id(conn), blockstore.packed_through(conn),
+        )
+        cached = st.session_state.get(f"{key}_pager")
+        if cached is None or cached[0] != signature:
+            cached = (signature, KeysetPager(where, params, descending=signature[3]))
+            st.session_state[f"{key}_pager"] = cached
+            st.session_state[f"{key}_page"] = 0
+        pager = cached[1]
+
+        page_no = st.session_state.get(f"{key}_page", 0)
+        cols, rows = pager.get_page(conn, page_no)
+    finally:
+        conn.close()
+
+    if not rows:
+        st.info("No records match the selected filters.")
+        return
+
+    page_df = pd.DataFrame(rows, columns=cols)
+    st.dataframe(page_df, width="stretch", hide_index=True)
+
+    def _goto(n):
+        st.session_state[f"{key}_page"] = n
+
+    nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+    with nav_prev:
+        st.button("◀ Previous", key=f"{key}_prev", disabled=page_no == 0,
+                  on_click=_goto, args=(page_no - 1,))
+    with nav_info:
+        st.caption(f"Page {page_no + 1} of {pager.page_count()} · {pager.total} records")
+    with nav_next:
+        st.button("Next ▶", key=f"{key}_next", disabled=not pager.has_next(page_no),
+                  on_click=_goto, args=(page_no + 1,))
+
 def check_password():
     """Checks if the password is correct using the database."""
     username = st.session_state["username"]
@@ -265,20 +476,69 @@ else:
     # Navigation
     st.sidebar.title(f"📂 Navigation ({st.session_state.role})")
     
-    options = ["Dashboard", "Networking", "Logout"]
+    options = ["Dashboard", "Networking", "Reports", "Correlation", "Logout"]
     if st.session_state.role == "admin":
         options.insert(1, "Configuration")
 
     page = st.sidebar.radio("Select Page", options)
 
-    if page == "Dashboard":
+    # Sites come from sites.json; with several, the Dashboard can merge them all
+    sites = load_sites()
+    site_paths = dict(sites)
+    if len(sites) > 1:
+        site = st.sidebar.selectbox("Site", [FLEET_VIEW] + list(site_paths), key="site")
+    else:
+        site = sites[0][0]
+    db_path = site_paths.get(site, DB_NAME)
+
+    if page == "Dashboard" and site == FLEET_VIEW:
+        st.title("🌍 Fleet Overview")
+        thresholds = (
+            ("cpu", st.session_state.cpu_threshold),
+            ("memory", st.session_state.memory_threshold),
+            ("disk", st.session_state.disk_threshold),
+        )
+        per_site, fleet = _fleet_summary(tuple(sites), thresholds)
+
+        for name, partial in per_site.items():
+            if isinstance(partial, Exception):
+                st.warning(f"Site {name} unavailable: {partial}")
+
+        def _row(name, agg):
+            row = {"Site": name, "Records": agg["rows"]}
+            for metric in METRICS:
+                m = agg["metrics"][metric]
+                mean = m["sum"] / m["count"] if m["count"] else None
+                row[f"Avg {LABELS[metric]}"] = round(mean, 2) if mean is not None else None
+                row[f"Max {LABELS[metric]}"] = m["max"]
+                row[f"{LABELS[metric]} Alerts"] = m["alerts"]
+            return row
+
+        site_rows = [_row(name, p) for name, p in per_site.items() if isinstance(p, dict)]
+        site_rows.append(_row("Fleet", fleet))
+        st.subheader("Per-Site and Fleet Metrics")
+        st.dataframe(pd.DataFrame(site_rows), hide_index=True, width="stretch")
+
+        st.subheader("Fleet Percentiles")
+        st.dataframe(pd.DataFrame([
+            {"Metric": LABELS[metric],
+             **{f"p{int(q * 100)}": quantile(fleet["metrics"][metric]["sketch"], q) for q in (0.5, 0.95, 0.99)}}
+            for metric in METRICS
+        ]), hide_index=True, width="stretch")
+
+        st.subheader("Top CPU Peaks Across Sites")
+        st.dataframe(pd.DataFrame(fleet["cpu_peaks"], columns=["CPU %", "Host", "Timestamp"]),
+                     hide_index=True, width="stretch")
+
+    elif page == "Dashboard":
         # Check if database exists
-        if not os.path.exists(DB_NAME):
+        if not os.path.exists(db_path):
             st.warning("Database not found. Please ensure 'log.db' from Week 7–11 exists.")
         else:
+            _migrate_db(db_path)
             # Connect to database and load system_log table
             try:
-                conn = sqlite3.connect(DB_NAME)
+                conn = sqlite3.connect(db_path)
                 df = pd.read_sql_query("SELECT * FROM system_log", conn)
                 conn.close()
         
@@ -301,9 +561,6 @@ else:
                     memory_alerts = df[df['memory'] > st.session_state.memory_threshold].shape[0]
                     disk_alerts = df[df['disk'] > st.session_state.disk_threshold].shape[0]
         
-                    # --- Display Key Statistics ---
-                    st.subheader("Key Metrics")
-
                     def metric_card(label, value, color):
                         st.markdown(f"""
                         <div style="
@@ -320,6 +577,56 @@ else:
                         </div>
                         """, unsafe_allow_html=True)
 
+                    # --- Live view from the hot store (no database reads) ---
+                    store = hot_store(db_path)
+                    hot_hosts = store.hosts()
+                    if hot_hosts:
+                        st.subheader("⚡ Live Now")
+                        live_host = st.selectbox("Host", hot_hosts, key="live_host")
+                        live_window = st.select_slider(
+                            "Window (samples)", options=[12, 36, 72, 144, 288], value=36, key="live_window"
+                        )
+                        latest = store.latest(live_host)
+                        if latest is None:
+                            st.info("No samples buffered for this host yet.")
+                        else:
+                            live_cols = st.columns(3)
+                            for col, metric, color in zip(live_cols, METRICS, ["#00c6ff", "#8E2DE2", "#FF416C"]):
+                                with col:
+                                    metric_card(f"Current {metric.title()}", f"{latest[metric]:.1f}%", color)
+                            st.caption(f"Last sample: {latest['timestamp']}")
+                            live_ts, live_values = store.window(live_host, live_window)
+                            st.line_chart(pd.DataFrame(live_values.T, index=live_ts, columns=list(METRICS)))
+                        if store.dropped():
+                            st.warning(
+                                f"{store.dropped()} samples from hosts beyond the first {len(hot_hosts)} "
+                                "were not buffered; raise HOTSTORE_MAX_HOSTS to include them."
+                            )
+
+                    # --- Hottest hosts, maintained incrementally ---
+                    st.subheader("🏆 Hottest Hosts")
+                    conn = sqlite3.connect(db_path)
+                    try:
+                        board = _leaderboard(db_path).refresh(conn)
+                    finally:
+                        conn.close()
+                    rank_kind = st.radio(
+                        "Rank by", ["current", "rolling"], horizontal=True, key="rank_kind",
+                        format_func=lambda k: "Current value" if k == "current" else f"Average of last {ROLLING_SAMPLES} samples",
+                    )
+                    rank_cols = st.columns(3)
+                    for col, metric in zip(rank_cols, METRICS):
+                        with col:
+                            st.markdown(f"**{LABELS[metric]}**")
+                            leaders = board.top(metric, rank_kind, k=5)
+                            st.dataframe(
+                                pd.DataFrame(leaders, columns=["Host", f"{LABELS[metric]} %"]).round(1),
+                                hide_index=True, width="stretch",
+                            )
+
+                    # --- Display Key Statistics ---
+                    st.subheader("Key Metrics")
+
                     col1, col2, col3 = st.columns(3)
                     with col1:
                         metric_card("Average CPU", f"{avg_cpu:.2f}%", "#00c6ff") # Cyan
@@ -350,21 +657,33 @@ else:
                     # --- Report Generation ---
                     st.subheader("📝 Generate Report")
                     
-                    report_data = {
-                        "Metric": [
-                            "Average CPU", "Average Memory", "Average Disk",
-                            "CPU Alerts", "Memory Alerts", "Disk Alerts"
-                        ],
-                        "Value": [
-                            f"{avg_cpu:.2f}%", f"{avg_memory:.2f}%", f"{avg_disk:.2f}%",
-                            str(cpu_alerts), str(memory_alerts), str(disk_alerts)
-                        ]
+                    thresholds = {
+                        "cpu": st.session_state.cpu_threshold,
+                        "memory": st.session_state.memory_threshold,
+                        "disk": st.session_state.disk_threshold,
                     }
-                    report_df = pd.DataFrame(report_data)
+                    if thresholds == reports.THRESHOLDS:
+                        # Default thresholds: served from the materialized reports
+                        conn = report_conn(db_path)
+                        try:
+                            dashboard_report = report_df(reports.all_time_report(conn))
+                        finally:
+                            conn.close()
+                    else:
+                        dashboard_report = pd.DataFrame({
+                            "Metric": [
+                                "Average CPU", "Average Memory", "Average Disk",
+                                "CPU Alerts", "Memory Alerts", "Disk Alerts"
+                            ],
+                            "Value": [
+                                f"{avg_cpu:.2f}%", f"{avg_memory:.2f}%", f"{avg_disk:.2f}%",
+                                str(cpu_alerts), str(memory_alerts), str(disk_alerts)
+                            ]
+                        })
                     
-                    st.table(report_df)
+                    st.table(dashboard_report)
         
-                    csv = report_df.to_csv(index=False).encode('utf-8')
+                    csv = dashboard_report.to_csv(index=False).encode('utf-8')
                     st.download_button(
                         label="Download Report as CSV",
                         data=csv,
@@ -377,16 +696,10 @@ else:
                     # Assuming 'timestamp' exists and is datetime
                     if 'timestamp' in df.columns:
                          # Filter for alerts
-                        alerts_df = df[
-                            (df['cpu'] > 80) | 
-                            (df['memory'] > 85) | 
-                            (df['disk'] > 90)
-                        ].copy()
-                        
-                        if not alerts_df.empty:
-                            st.dataframe(alerts_df.sort_values(by="timestamp", ascending=False))
-                        else:
-                            st.info("No alerts found in the logs.")
+                        alert_where, alert_params = build_where([
+                            ("cpu > ? OR memory > ? OR disk > ?", (80, 85, 90)),
+                        ])
+                        paginated_table("alerts", alert_where, alert_params, db_path)
         
             except Exception as e:
                 st.error(f"An error occurred: {e}")
@@ -395,23 +708,19 @@ else:
         st.title("🌐 Interactive Data Center Dashboard")
 
         # Check if database exists
-        if not os.path.exists(DB_NAME):
+        if site == FLEET_VIEW:
+            st.info("Select a single site in the sidebar to browse its records.")
+        elif not os.path.exists(db_path):
             st.warning("Database not found. Please make sure 'log.db' from Week 7–8 exists.")
         else:
-            conn = sqlite3.connect(DB_NAME)
-            df = pd.read_sql_query("SELECT * FROM system_log", conn)
-            # Ensure timestamp is parsed
-            if "timestamp" in df.columns:
-                try:
-                    df["timestamp"] = pd.to_datetime(df["timestamp"])
-                except Exception:
-                    pass
+            _migrate_db(db_path)
+            conn = sqlite3.connect(db_path)
+            table_cols = get_columns(conn)
 
             # Refresh controls
             if st.sidebar.button("Refresh"):
-                rerun = getattr(st, "experimental_rerun", None)
-                if callable(rerun):
-                    rerun()
+                _networking_overview.clear()
+                _gap_segments.clear()
 
             # Filters in the sidebar
             st.sidebar.markdown("### Filters")
@@ -419,52 +728,226 @@ else:
             cpu_threshold = st.sidebar.slider("CPU Threshold (%)", 0, 100, 0)
             # Optional: date filter (bonus)
             try:
-                min_date = df["timestamp"].min().date()
-                max_date = df["timestamp"].max().date()
+                dates = [pd.to_datetime(ts).date() for ts in time_bounds(conn) if ts is not None]
+                if blockstore.packed_through(conn) is not None:
+                    dates += [pd.to_datetime(ts, unit="s").date() for ts in blockstore.time_bounds(conn)]
+                min_date, max_date = min(dates), max(dates)
                 date_range = st.sidebar.date_input("Date range", value=(min_date, max_date))
             except Exception:
                 date_range = None
 
-            # Apply filters
-            df_filtered = df.copy()
-            if ping_filter != "All" and "ping_status" in df_filtered.columns:
-                df_filtered = df_filtered[df_filtered["ping_status"] == ping_filter]
-            if "cpu" in df_filtered.columns:
-                df_filtered = df_filtered[df_filtered["cpu"] >= cpu_threshold]
-            if date_range and isinstance(date_range, tuple) and "timestamp" in df_filtered.columns:
-                start_dt = pd.to_datetime(date_range[0])
-                end_dt = pd.to_datetime(date_range[1])
-                end_dt = end_dt + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-                df_filtered = df_filtered[(df_filtered["timestamp"] >= start_dt) & (df_filtered["timestamp"] <= end_dt)]
+            # Filters are pushed down to SQL; only the visible page and aggregates are read
+            clauses = []
+            if ping_filter != "All" and "ping_status" in table_cols:
+                clauses.append(("ping_status = ?", (ping_filter,)))
+            clauses.append(("cpu >= ?", (cpu_threshold,)))
+            if date_range and isinstance(date_range, tuple) and len(date_range) == 2:
+                clauses.append(("timestamp >= ? AND timestamp <= ?", (
+                    f"{date_range[0]:%Y-%m-%d} 00:00:00", f"{date_range[1]:%Y-%m-%d} 23:59:59",
+                )))
+            where, params = build_where(clauses)
 
             st.subheader("Filtered Records")
-            if df_filtered.empty:
-                st.info("No records match the selected filters.")
-            else:
-                st.dataframe(df_filtered, width="stretch")
+            paginated_table("networking", where, params, db_path)
+            if blockstore.packed_through(conn) is not None:
+                st.caption("Rows removed by `cli.py pack --prune` are in the counts and chart below, not in this table.")
 
             # Alert count: records where cpu exceeds threshold OR ping is DOWN
-            alert_count = 0
-            if not df.empty:
-                cond_cpu = df.get("cpu") > cpu_threshold if "cpu" in df.columns else pd.Series(False, index=df.index)
-                cond_ping = df.get("ping_status") == "DOWN" if "ping_status" in df.columns else pd.Series(False, index=df.index)
-                alert_count = int((cond_cpu | cond_ping).sum())
+            alert_sql = "cpu > ?" + (" OR ping_status = 'DOWN'" if "ping_status" in table_cols else "")
+            alert_where, alert_params = build_where([(alert_sql, (cpu_threshold,))])
+            chart_cols = tuple(c for c in ["cpu", "memory", "disk"] if c in table_cols)
+            # Blocks only keep the metrics, so a ping_status filter reads system_log alone
+            packed_filter = None
+            if "ping_status" not in table_cols:
+                span = date_range if date_range and isinstance(date_range, tuple) and len(date_range) == 2 else None
+                packed_filter = (
+                    blockstore.to_epoch(f"{span[0]:%Y-%m-%d} 00:00:00") if span else None,
+                    blockstore.to_epoch(f"{span[1]:%Y-%m-%d} 23:59:59") if span else None,
+                    cpu_threshold,
+                )
+            total_records, alert_count, chart_df = _networking_overview(
+                db_path, where, params, alert_where, alert_params, chart_cols, packed_filter
+            )
 
             col1, col2 = st.columns(2)
-            col1.metric("Total records", len(df))
+            col1.metric("Total records", total_records)
             col2.metric("Alert count", alert_count)
 
-            # Charts
+            # Charts (time-bucketed averages of the filtered records)
             st.subheader("📈 Resource Usage Over Time")
-            if "timestamp" in df_filtered.columns and not df_filtered.empty:
-                chart_df = df_filtered.set_index("timestamp")[ [c for c in ["cpu", "memory", "disk"] if c in df_filtered.columns] ]
-                if not chart_df.empty:
-                    st.line_chart(chart_df)
+            if "timestamp" in table_cols and not chart_df.empty:
+                st.line_chart(chart_df)
             else:
                 st.info("No time-series data available for the selected filters.")
 
+            # Gaps and stale hosts
+            st.subheader("🕳️ Collection Gaps & Stale Hosts")
+            max_missed = st.sidebar.number_input(
+                "Stale after (missed samples)", min_value=1, max_value=288, value=DEFAULT_MAX_MISSED
+            )
+            stale = _staleness_tracker(db_path).refresh(conn).stale_hosts(max_missed=max_missed)
+            if stale:
+                st.error(f"{len(stale)} host(s) silent for more than {max_missed} sample intervals.")
+                st.dataframe(pd.DataFrame(stale), width="stretch", hide_index=True)
+            else:
+                st.success("All hosts are reporting.")
+
+            gap_range = {}
+            if date_range and isinstance(date_range, tuple) and len(date_range) == 2:
+                gap_range = {
+                    "start": f"{date_range[0]:%Y-%m-%d} 00:00:00",
+                    "end": f"{date_range[1]:%Y-%m-%d} 23:59:59",
+                }
+            gaps = _gap_segments(db_path, **gap_range)
+            if gaps:
+                st.dataframe(pd.DataFrame(gaps), width="stretch", hide_index=True)
+            else:
+                st.info("No gaps in sample collection for the selected range.")
+
             conn.close()
 
+    elif page == "Reports":
+        st.title("🗂️ Reports")
+        if site == FLEET_VIEW:
+            st.info("Select a single site in the sidebar to browse its reports.")
+        elif not os.path.exists(db_path):
+            st.warning("Database not found. Please ensure 'log.db' from Week 7–11 exists.")
+        else:
+            _migrate_db(db_path)
+            period = st.radio(
+                "Period", list(reports.PERIODS), horizontal=True, key="report_period",
+                format_func=lambda p: "Hourly" if p == "hour" else "Daily",
+            )
+            conn = report_conn(db_path)
+            try:
+                current = reports.current_report(conn, period)
+                history = reports.list_reports(conn, period)
+            finally:
+                conn.close()
+            st.caption(
+                "Alert counts use the default thresholds "
+                f"(CPU > {reports.THRESHOLDS['cpu']}%, Memory > {reports.THRESHOLDS['memory']}%, "
+                f"Disk > {reports.THRESHOLDS['disk']}%)."
+            )
+
+            st.subheader("Current Period (so far)")
+            if current:
+                st.caption(f"Since {current['period_start']}: {current['rows']} records")
+                st.table(report_df(current))
+            else:
+                st.info("No samples in the current period yet.")
+
+            st.subheader("History")
+            if not history:
+                st.info("No closed periods yet.")
+            else:
+                starts = [r["period_start"] for r in history]
+                chosen = st.selectbox("Report", starts, key=f"report_{period}")
+                report = history[starts.index(chosen)]
+                st.caption(
+                    f"{report['rows']} records, max CPU {report['cpu_max']}, "
+                    f"top CPU peaks {report['cpu_peaks']}"
+                )
+                chosen_df = report_df(report)
+                st.table(chosen_df)
+                st.download_button(
+                    "Download Report as CSV",
+                    data=chosen_df.to_csv(index=False).encode("utf-8"),
+                    file_name=f"report_{period}_{chosen.replace(' ', '_').replace(':', '')}.csv",
+                    mime="text/csv",
+                )
+                history_df = pd.DataFrame(history).drop(columns=["period", "created_at"])
+                history_df["cpu_peaks"] = history_df["cpu_peaks"].astype(str)
+                st.download_button(
+                    "Download Full History as CSV",
+                    data=history_df.to_csv(index=False).encode("utf-8"),
+                    file_name=f"reports_{period}.csv",
+                    mime="text/csv",
+                )
+
+    elif page == "Correlation":
+        st.title("🔗 Correlation Analysis")
+        if site == FLEET_VIEW:
+            st.info("Select a single site in the sidebar to analyze its hosts.")
+        elif not os.path.exists(db_path):
+            st.warning("Database not found. Please ensure 'log.db' from Week 7–11 exists.")
+        else:
+            _migrate_db(db_path)
+            window = st.selectbox("Window", list(correlation.WINDOWS), index=2, key="corr_window")
+            conn = sqlite3.connect(db_path)
+            try:
+                end = correlation.window_end(conn, correlation.WINDOWS[window][1])
+            finally:
+                conn.close()
+            result = _correlations(db_path, window, end) if end else None
+
+            if not result or not result["hosts"]:
+                st.info("No samples in this window.")
+            else:
+                hosts = result["hosts"]
+                st.caption(
+                    f"{len(hosts)} hosts, {result['start']} → {result['end']}, "
+                    f"{result['step'] // 60}-minute buckets, {result['coverage']:.0%} of buckets sampled"
+                )
+
+                st.subheader("Metrics Moving Together (per host, averaged)")
+                with np.errstate(invalid="ignore"):
+                    mean_cross = np.nanmean(result["cross_metric"], axis=0)
+                labels = [LABELS[m] for m in METRICS]
+                st.dataframe(pd.DataFrame(mean_cross, index=labels, columns=labels).round(2), width="stretch")
+
+                st.subheader("Most Correlated Pairs")
+                pairs_df = pd.DataFrame(result["pairs"], columns=["Series A", "Series B", "Correlation"])
+                st.dataframe(pairs_df.round({"Correlation": 3}), hide_index=True, width="stretch")
+
+                st.subheader("Correlation Matrix")
+                paired_hosts = [label.rsplit(":", 1)[0] for a, b, _ in result["pairs"] for label in (a, b)]
+                default_hosts = list(dict.fromkeys(paired_hosts))[:5] or hosts[:5]
+                chosen_hosts = st.multiselect("Hosts", hosts, default=default_hosts, key="corr_hosts")
+                if chosen_hosts:
+                    import altair as alt
+
+                    index = {h: i for i, h in enumerate(hosts)}
+                    series = [index[h] * len(METRICS) + m for h in chosen_hosts for m in range(len(METRICS))]
+                    names = [result["labels"][i] for i in series]
+                    matrix = result["matrix"][np.ix_(series, series)]
+                    n_buckets = len(result["times"])
+                    if n_buckets > 3 and st.toggle("Sliding window", key="corr_matrix_sliding"):
+                        span = st.slider("Window (buckets)", 3, n_buckets, min(12, n_buckets), key="corr_matrix_span")
+                        flat = result["values"].reshape(len(hosts) * len(METRICS), -1)
+                        # One matrix per window position; the slider picks which one to show
+                        stack = correlation.rolling_matrices(flat[series], span)
+                        ends = [t.strftime("%Y-%m-%d %H:%M") for t in result["times"][span - 1:]]
+                        position = st.select_slider(
+                            "Window ending at", ends, value=ends[-1], key=f"corr_matrix_end_{span}"
+                        )
+                        matrix = stack[ends.index(position)]
+                    sub = pd.DataFrame(matrix, index=names, columns=names)
+                    heat = sub.rename_axis("A").reset_index().melt("A", var_name="B", value_name="Correlation")
+                    st.altair_chart(
+                        alt.Chart(heat).mark_rect().encode(
+                            x=alt.X("A:N", sort=names, title=None),
+                            y=alt.Y("B:N", sort=names, title=None),
+                            color=alt.Color("Correlation:Q", scale=alt.Scale(scheme="redblue", domain=[-1, 1], reverse=True)),
+                            tooltip=["A", "B", alt.Tooltip("Correlation:Q", format=".2f")],
+                        ),
+                        width="stretch",
+                    )
+
+                if result["pairs"]:
+                    st.subheader("Rolling Correlation")
+                    pair = st.selectbox(
+                        "Pair", range(len(result["pairs"])), key="corr_pair",
+                        format_func=lambda i: f"{result['pairs'][i][0]} ~ {result['pairs'][i][1]}",
+                    )
+                    n_buckets = len(result["times"])
+                    if n_buckets > 3:
+                        span = st.slider("Rolling window (buckets)", 3, n_buckets, min(12, n_buckets), key="corr_span")
+                        flat = result["values"].reshape(len(hosts) * len(METRICS), -1)
+                        a, b = (result["labels"].index(label) for label in result["pairs"][pair][:2])
+                        rolling = correlation.rolling_correlation(flat[a], flat[b], span)[0]
+                        st.line_chart(pd.Series(rolling, index=result["times"][span - 1:], name="Correlation"))
+
     elif page == "Configuration":
         if st.session_state.role != "admin":
             st.error("Access Denied")
@@ -514,13 +997,21 @@ else:
     # Display file contents if requested (kept at bottom)
     if st.session_state.show_summary:
         try:
-            with open("summary.txt", "r", encoding="utf-8") as f:
-                content = f.read()
+            # Served from the materialized reports; summary.txt is the fallback
+            try:
+                conn = report_conn(db_path)
+                try:
+                    content = reports.summary_text(conn)
+                finally:
+                    conn.close()
+            except Exception:
+                with open("summary.txt", "r", encoding="utf-8") as f:
+                    content = f.read()
             st.subheader("Summary")
             st.code(content)
             st.download_button("Download Summary", data=content, file_name="summary.txt", mime="text/plain")
         except Exception as e:
-            st.error(f"Could not read summary.txt: {e}")
+            st.error(f"Could not load the summary: {e}")
 
     if st.session_state.show_test_report:
         try:
@@ -0,0 +1,502 @@
+"""Optional compressed block storage for system_log metrics.
+
+Samples are packed per host and metric into blocks of up to BLOCK_SIZE
+points, encoded Gorilla-style:
+
+- timestamps: first value, first delta, then delta-of-delta with
+  variable-width buckets (a regular 5-minute cadence costs 1 bit/sample)
+- values: first value, then XOR with the previous value, storing only the
+  meaningful bits and reusing the previous leading/trailing-zero window
+
+Blocks live in the `metric_blocks` table as BLOBs, next to their time range,
+min/max value and count of non-NaN values; the cpu, memory and disk blocks cut
+from the same rows share a group_id. Range and threshold scans read that index
+first and only decode blocks that can contain matching samples; decoded blocks
+are immutable and kept in a small in-process cache.
+
+`pack(prune=True)` makes the blocks the only copy of packed rows. Readers then
+combine both stores: samples up to packed_through() come from the blocks,
+everything else (row_store_filter(): newer rows and the ones pack() skipped)
+from system_log.
+"""
+import calendar
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+TABLE_NAME = "system_log"
+BLOCK_TABLE = "metric_blocks"
+STATE_TABLE = "metric_blocks_state"
+# Rows pack() skipped (unparseable timestamp); they are read from system_log
+SKIPPED_TABLE = "metric_blocks_skipped"
+METRICS = ("cpu", "memory", "disk")
+BLOCK_SIZE = 720
+# Columns a pruned system_log row can be rebuilt from; anything else would be lost
+PACKED_COLUMNS = ("id", "timestamp", "host") + METRICS
+# Decoded blocks kept in memory (720 samples each, ~11 KB)
+DECODE_CACHE_BLOCKS = 2048
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class _BitWriter:
+    def __init__(self):
+        self.acc = 0
+        self.nbits = 0
+
+    def write(self, value, nbits):
+        self.acc = (self.acc << nbits) | (value & ((1 << nbits) - 1))
+        self.nbits += nbits
+
+    def getvalue(self):
+        pad = -self.nbits % 8
+        return (self.acc << pad).to_bytes((self.nbits + pad) // 8, "big")
+
+
+class _BitReader:
+    def __init__(self, data):
+        # Slicing a bit string is ~3x faster than shifting the whole block's int
+        self.bits = format(int.from_bytes(data, "big"), f"0{len(data) * 8}b")
+        self.pos = 0
+
+    def read(self, nbits):
+        pos = self.pos
+        self.pos = pos + nbits
+        return int(self.bits[pos:pos + nbits], 2)
+
+
+def _signed(value, nbits):
+    return value - (1 << nbits) if value >= 1 << (nbits - 1) else value
+
+
+# (prefix, prefix bits, value bits) for delta-of-delta buckets
+_DOD_BUCKETS = [(0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12)]
+
+
+def encode_block(timestamps, values):
+    """Encodes epoch-second timestamps and float values into one block."""
+    ts = np.asarray(timestamps, dtype=np.int64)
+    bits = np.asarray(values, dtype=np.float64).view(np.uint64)
+    n = len(ts)
+    w = _BitWriter()
+    if n == 0:
+        return struct.pack(">I", 0)
+
+    w.write(int(ts[0]), 64)
+    if n > 1:
+        deltas = np.diff(ts)
+        w.write(int(deltas[0]), 64)
+        for dod in np.diff(deltas).tolist():
+            if dod == 0:
+                w.write(0, 1)
+                continue
+            for prefix, plen, vlen in _DOD_BUCKETS:
+                if -(1 << (vlen - 1)) <= dod < (1 << (vlen - 1)):
+                    w.write(prefix, plen)
+                    w.write(dod, vlen)
+                    break
+            else:
+                w.write(0b1111, 4)
+                w.write(dod, 64)
+
+    w.write(int(bits[0]), 64)
+    prev_lead, prev_trail = -1, -1
+    for x in np.bitwise_xor(bits[1:], bits[:-1]).tolist():
+        if x == 0:
+            w.write(0, 1)
+            continue
+        lead = min(64 - x.bit_length(), 31)
+        trail = (x & -x).bit_length() - 1
+        if prev_lead >= 0 and lead >= prev_lead and trail >= prev_trail:
+            w.write(0b10, 2)
+            w.write(x >> prev_trail, 64 - prev_lead - prev_trail)
+        else:
+            length = 64 - lead - trail
+            w.write(0b11, 2)
+            w.write(lead, 5)
+            w.write(length & 63, 6)
+            w.write(x >> trail, length)
+            prev_lead, prev_trail = lead, trail
+    return struct.pack(">I", n) + w.getvalue()
+
+
+def decode_block(data):
+    """Inverse of encode_block(): returns (int64 timestamps, float64 values)."""
+    n = struct.unpack(">I", data[:4])[0]
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    r = _BitReader(data[4:])
+
+    dods = [0] * n
+    dods[0] = r.read(64)
+    if n > 1:
+        dods[1] = _signed(r.read(64), 64)
+        for i in range(2, n):
+            if r.read(1) == 0:
+                continue
+            for _, plen, vlen in _DOD_BUCKETS:
+                if r.read(1) == 0:
+                    dods[i] = _signed(r.read(vlen), vlen)
+                    break
+            else:
+                dods[i] = _signed(r.read(64), 64)
+    # t0, delta0, dod... -> deltas -> timestamps
+    ts = np.array(dods, dtype=np.int64)
+    ts[1:] = np.cumsum(ts[1:])
+    ts = np.cumsum(ts)
+
+    xors = [0] * n
+    xors[0] = r.read(64)
+    lead, trail = 0, 0
+    for i in range(1, n):
+        if r.read(1) == 0:
+            continue
+        if r.read(1) == 1:
+            lead = r.read(5)
+            length = r.read(6) or 64
+            trail = 64 - lead - length
+        xors[i] = r.read(64 - lead - trail) << trail
+    values = np.bitwise_xor.accumulate(np.array(xors, dtype=np.uint64)).view(np.float64)
+    return ts, values
+
+
+def ensure_tables(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BLOCK_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            host TEXT,
+            metric TEXT,
+            start_ts INTEGER,
+            end_ts INTEGER,
+            count INTEGER,
+            min_value REAL,
+            max_value REAL,
+            data BLOB,
+            group_id INTEGER,
+            valid INTEGER
+        )
+    """)
+    cols = [row[1] for row in conn.execute(f"PRAGMA table_info({BLOCK_TABLE})").fetchall()]
+    if "group_id" not in cols:
+        # Blocks from before groups were recorded: pack() inserted each group's
+        # cpu, memory and disk blocks back to back
+        conn.execute(f"ALTER TABLE {BLOCK_TABLE} ADD COLUMN group_id INTEGER")
+        conn.execute(f"ALTER TABLE {BLOCK_TABLE} ADD COLUMN valid INTEGER")
+        offsets = " ".join(f"WHEN '{m}' THEN {i}" for i, m in enumerate(METRICS))
+        conn.execute(f"UPDATE {BLOCK_TABLE} SET group_id = id - CASE metric {offsets} END")
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{BLOCK_TABLE}_range "
+        f"ON {BLOCK_TABLE} (metric, host, start_ts, end_ts)"
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{BLOCK_TABLE}_max ON {BLOCK_TABLE} (metric, max_value)"
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{BLOCK_TABLE}_group ON {BLOCK_TABLE} (group_id)")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (last_id INTEGER)")
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SKIPPED_TABLE,)
+    ).fetchone():
+        conn.execute(f"CREATE TABLE {SKIPPED_TABLE} (id INTEGER PRIMARY KEY)")
+        # Packed before skipped rows were recorded
+        conn.execute(
+            f"INSERT INTO {SKIPPED_TABLE} SELECT id FROM {TABLE_NAME} "
+            f"WHERE id <= (SELECT COALESCE(MAX(last_id), 0) FROM {STATE_TABLE}) "
+            f"AND strftime('%s', timestamp) IS NULL"
+        )
+    conn.commit()
+
+
+def pack(conn, prune=False):
+    """Packs system_log rows inserted since the last pack into blocks.
+
+    Rows without a parseable timestamp or with a non-numeric value are
+    skipped: they stay in system_log and are listed in SKIPPED_TABLE, so
+    readers still compare them the way SQL does. NULLs are stored as NaN.
+    With `prune`, every packed row (this pass and earlier ones) is deleted
+    from system_log, so the blocks are their only copy; that is refused if
+    system_log has columns the blocks don't keep. Returns the number of rows
+    packed.
+    """
+    ensure_tables(conn)
+    if prune:
+        extra = [c for c in _columns(conn, TABLE_NAME) if c not in PACKED_COLUMNS]
+        if extra:
+            raise ValueError(f"Can't prune: {', '.join(extra)} would be lost (blocks keep {', '.join(METRICS)})")
+    row = conn.execute(f"SELECT last_id FROM {STATE_TABLE}").fetchone()
+    last_id = row[0] if row else 0
+    max_id = conn.execute(f"SELECT MAX(id) FROM {TABLE_NAME} WHERE id > ?", (last_id,)).fetchone()[0]
+    if max_id is None:
+        if prune:
+            with conn:
+                _prune(conn, last_id)
+        return 0
+    epoch = "CAST(strftime('%s', timestamp) AS INTEGER)"
+    clean = " AND ".join(
+        ["strftime('%s', timestamp) IS NOT NULL"]
+        + [f"typeof({m}) IN ('integer', 'real', 'null')" for m in METRICS]
+    )
+    packable = f"id > ? AND id <= ? AND {clean}"
+    rows = conn.execute(
+        f"SELECT host, {epoch}, {', '.join(METRICS)} FROM {TABLE_NAME} "
+        f"WHERE {packable} ORDER BY host, timestamp, id",
+        (last_id, max_id),
+    ).fetchall()
+
+    hosts = np.array([r[0] or "" for r in rows], dtype=object)
+    ts = np.array([r[1] for r in rows], dtype=np.int64)
+    values = np.array([[np.nan if v is None else v for v in r[2:]] for r in rows], dtype=np.float64)
+
+    # Runs of the same host, cut into BLOCK_SIZE pieces; each piece is one group
+    group = conn.execute(f"SELECT COALESCE(MAX(group_id), 0) FROM {BLOCK_TABLE}").fetchone()[0]
+    bounds = np.flatnonzero(hosts[1:] != hosts[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(rows)]))
+    blocks = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        for lo in range(start, end, BLOCK_SIZE):
+            hi = min(lo + BLOCK_SIZE, end)
+            group += 1
+            for m, metric in enumerate(METRICS):
+                col = values[lo:hi, m]
+                valid = int(np.count_nonzero(~np.isnan(col)))
+                blocks.append((
+                    hosts[lo], metric, int(ts[lo]), int(ts[hi - 1]), hi - lo,
+                    float(np.nanmin(col)) if valid else None,
+                    float(np.nanmax(col)) if valid else None,
+                    encode_block(ts[lo:hi], col), group, valid,
+                ))
+
+    with conn:
+        conn.executemany(
+            f"INSERT INTO {BLOCK_TABLE} (host, metric, start_ts, end_ts, count, min_value, max_value, "
+            "data, group_id, valid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            blocks,
+        )
+        conn.execute(f"DELETE FROM {STATE_TABLE}")
+        # Skipped rows count as seen, so they aren't rescanned on every pack
+        conn.execute(f"INSERT INTO {STATE_TABLE} (last_id) VALUES (?)", (max_id,))
+        conn.execute(
+            f"INSERT OR IGNORE INTO {SKIPPED_TABLE} SELECT id FROM {TABLE_NAME} "
+            f"WHERE id > ? AND id <= ? AND NOT ({clean})",
+            (last_id, max_id),
+        )
+        if prune:
+            _prune(conn, max_id)
+    return len(rows)
+
+
+def _prune(conn, through):
+    # Exactly the rows that were packed: skipped ones stay readable
+    conn.execute(
+        f"DELETE FROM {TABLE_NAME} WHERE id <= ? AND id NOT IN (SELECT id FROM {SKIPPED_TABLE})", (through,)
+    )
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def to_epoch(timestamp):
+    """Epoch seconds of a 'YYYY-MM-DD HH:MM:SS' string, as SQLite's strftime('%s') reads it."""
+    return calendar.timegm(datetime.strptime(timestamp, TS_FORMAT).timetuple())
+
+
+# --- readers ---
+
+_decoded = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def _decode(conn, db_file, block_id, count):
+    # Keyed on the database file too: block ids restart in a recreated log.db
+    key = (db_file, block_id, count)
+    with _decoded_lock:
+        if key in _decoded:
+            _decoded.move_to_end(key)
+            return _decoded[key]
+    data = conn.execute(f"SELECT data FROM {BLOCK_TABLE} WHERE id = ?", (block_id,)).fetchone()[0]
+    block = decode_block(data)
+    with _decoded_lock:
+        _decoded[key] = block
+        while len(_decoded) > DECODE_CACHE_BLOCKS:
+            _decoded.popitem(last=False)
+    return block
+
+
+def _db_file(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def _block_filter(metric, host=None, start=None, end=None, above=None, at_least=None):
+    clauses, params = ["metric = ?"], [metric]
+    if host is not None:
+        clauses.append("host = ?")
+        params.append(host)
+    if start is not None:
+        clauses.append("end_ts >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("start_ts <= ?")
+        params.append(end)
+    if above is not None:
+        clauses.append("max_value > ?")
+        params.append(above)
+    if at_least is not None:
+        clauses.append("max_value >= ?")
+        params.append(at_least)
+    return " AND ".join(clauses), params
+
+
+def _in_range(ts, start, end):
+    mask = np.ones(len(ts), dtype=bool)
+    if start is not None:
+        mask &= ts >= start
+    if end is not None:
+        mask &= ts <= end
+    return mask
+
+
+def scan(conn, metric, host=None, start=None, end=None, above=None):
+    """Yields (host, timestamps, values) per block overlapping [start, end]
+    (epoch seconds), restricted to samples above `above` if given. Blocks
+    outside the range or with max_value <= above are never decoded."""
+    where, params = _block_filter(metric, host, start, end, above)
+    db_file = _db_file(conn)
+    blocks = conn.execute(
+        f"SELECT id, host, count FROM {BLOCK_TABLE} WHERE {where} ORDER BY host, start_ts", params
+    ).fetchall()
+    for block_id, block_host, count in blocks:
+        ts, values = _decode(conn, db_file, block_id, count)
+        mask = _in_range(ts, start, end)
+        if above is not None:
+            mask &= values > above
+        if mask.all():
+            yield block_host, ts, values
+        elif mask.any():
+            yield block_host, ts[mask], values[mask]
+
+
+def packed_through(conn):
+    """Highest system_log id held in the blocks, or None if nothing was packed."""
+    try:
+        row = conn.execute(f"SELECT last_id FROM {STATE_TABLE}").fetchone()
+        has_blocks = conn.execute(f"SELECT 1 FROM {BLOCK_TABLE} LIMIT 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row and has_blocks else None
+
+
+def row_store_filter(last_id):
+    """(sql, params) selecting the system_log rows that aren't in the blocks."""
+    return f"id > ? OR id IN (SELECT id FROM {SKIPPED_TABLE})", (last_id,)
+
+
+def count_packed(conn, metric=METRICS[0], start=None, end=None, above=None):
+    """Packed samples in [start, end] (epoch seconds), or only those whose
+    `metric` is above `above`. Blocks inside the range are counted from the
+    index when every value matches (or none is asked for); only blocks that
+    straddle the range or the threshold are decoded."""
+    where, params = _block_filter(metric, None, start, end, above)
+    db_file = _db_file(conn)
+    total = 0
+    blocks = conn.execute(
+        f"SELECT id, start_ts, end_ts, count, min_value, valid FROM {BLOCK_TABLE} WHERE {where}", params
+    ).fetchall()
+    for block_id, block_start, block_end, count, min_value, valid in blocks:
+        inside = (start is None or block_start >= start) and (end is None or block_end <= end)
+        if inside and above is None:
+            total += count
+        elif inside and valid is not None and min_value is not None and min_value > above:
+            total += valid
+        else:
+            ts, values = _decode(conn, db_file, block_id, count)
+            mask = _in_range(ts, start, end)
+            if above is not None:
+                mask &= values > above
+            total += int(np.count_nonzero(mask))
+    return total
+
+
+def time_bounds(conn, start=None, end=None):
+    """(first, last) epoch seconds of the packed samples in [start, end], or (None, None)."""
+    where, params = _block_filter(METRICS[0], None, start, end)
+    first, last = conn.execute(
+        f"SELECT MIN(start_ts), MAX(end_ts) FROM {BLOCK_TABLE} WHERE {where}", params
+    ).fetchone()
+    if first is None:
+        return None, None
+    return max(first, start) if start is not None else first, min(last, end) if end is not None else last
+
+
+def last_seen(conn):
+    """{host: newest packed timestamp as a log.db string}; empty if nothing was packed."""
+    try:
+        rows = conn.execute(
+            f"SELECT host, MAX(end_ts) FROM {BLOCK_TABLE} WHERE metric = ? GROUP BY host", (METRICS[0],)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {host: time.strftime(TS_FORMAT, time.gmtime(ts)) for host, ts in rows}
+
+
+def bucket_totals(conn, columns, first, width, n_buckets, start=None, end=None, metric=None, at_least=None):
+    """Per-bucket sums and non-NaN counts of `columns` over the packed samples in
+    [start, end] whose `metric` is at least `at_least`; bucket i starts at
+    first + i * width. Returns (sums, counts), both (len(columns), n_buckets).
+
+    Groups are picked from `metric`'s block index, so groups outside the range
+    or whose maximum is below `at_least` are never decoded.
+    """
+    metric = metric or columns[0]
+    sums = np.zeros((len(columns), n_buckets))
+    counts = np.zeros((len(columns), n_buckets), dtype=np.int64)
+    where, params = _block_filter(metric, None, start, end, at_least=at_least)
+    wanted = sorted(set(columns) | {metric})
+    db_file = _db_file(conn)
+    groups = {}
+    for group_id, block_id, block_metric, count in conn.execute(
+        f"SELECT group_id, id, metric, count FROM {BLOCK_TABLE} "
+        f"WHERE group_id IN (SELECT group_id FROM {BLOCK_TABLE} WHERE {where}) "
+        f"AND metric IN ({', '.join('?' * len(wanted))})",
+        params + wanted,
+    ):
+        groups.setdefault(group_id, {})[block_metric] = (block_id, count)
+    for blocks in groups.values():
+        decoded = {m: _decode(conn, db_file, *blocks[m]) for m in wanted if m in blocks}
+        ts = decoded[metric][0]
+        mask = _in_range(ts, start, end)
+        if at_least is not None:
+            mask &= decoded[metric][1] >= at_least
+        bucket = (ts - first) // width
+        mask &= (bucket >= 0) & (bucket < n_buckets)
+        for i, column in enumerate(columns):
+            if column not in decoded:
+                continue
+            values = decoded[column][1][mask]
+            ok = ~np.isnan(values)
+            sums[i] += np.bincount(bucket[mask][ok], weights=values[ok], minlength=n_buckets)
+            counts[i] += np.bincount(bucket[mask][ok], minlength=n_buckets)
+    return sums, counts
+
+
+def storage_stats(conn):
+    """Bytes and samples in system_log (with its indexes) and in the blocks. Row
+    store bytes come from dbstat when SQLite was built with it, else None."""
+    block_bytes, block_samples = conn.execute(
+        f"SELECT COALESCE(SUM(length(data)), 0), "
+        f"COALESCE(SUM(CASE WHEN metric = ? THEN count END), 0) FROM {BLOCK_TABLE}",
+        (METRICS[0],),
+    ).fetchone()
+    rows = conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+    try:
+        raw = conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = ? OR name LIKE ?",
+            (TABLE_NAME, f"idx_{TABLE_NAME}_%"),
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        raw = None
+    return {"row_store_bytes": raw, "row_store_rows": rows, "block_bytes": block_bytes, "block_samples": block_samples}
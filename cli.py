@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""Command-line entry point for the batch tools.
+
+Usage:
+    python cli.py summary [--no-alert]   # write summary.txt (main.py)
+    python cli.py validate [--no-save] [--full]
+                                         # run the system test (test_script.py)
+    python cli.py alert                  # send the CPU alert only if a record exceeds 90%
+    python cli.py seed                   # create log.db with dummy data (setup_db.py)
+    python cli.py stale [--max-missed N] # list silent hosts and collection gaps
+    python cli.py hotsync [--interval S] # keep the in-memory hot store fed from log.db
+    python cli.py pack [--prune]         # compress new rows into metric blocks
+    python cli.py fleet                  # merged metrics across all sites in sites.json
+    python cli.py reports [--interval S] [--rebuild]
+                                         # materialize hourly/daily reports, refresh summary.txt
+    python cli.py loadtest [--sessions N] [--concurrency C] [--hosts H] [--days D] [--rebuild] [--threads]
+                                         # drive headless dashboard sessions, report latency
+    python cli.py startup [--runs N]     # check cold-start overhead against the budget
+
+Each subcommand imports its module only when it runs, so a cron invocation
+pays for sqlite3 and nothing heavier.
+"""
+import argparse
+import sys
+
+# Allowed interpreter overhead of `python cli.py ...` beyond a bare `python -c pass`
+STARTUP_BUDGET_MS = 50
+
+
+def cmd_summary(args):
+    import main
+
+    return 0 if main.run_summary(send_alert=not args.no_alert) is not None else 1
+
+
+def cmd_validate(args):
+    import test_script
+
+    db_found = test_script.file_exists(test_script.DB_NAME)
+    summary = test_script.run_tests(save_report=not args.no_save, full=args.full)
+    # run_tests() still returns (zeroed) counters when log.db is missing, and {}
+    # when system_log is; both are failures
+    return 0 if db_found and summary else 1
+
+
+def cmd_alert(args):
+    import os
+    import sqlite3
+    import main
+
+    if not os.path.exists(main.DB_NAME):
+        print("Database not found. Please ensure log.db exists.")
+        return 1
+    conn = sqlite3.connect(main.DB_NAME)
+    try:
+        main.migrate_db(conn)
+        summary, over_90 = main.summarize_db(conn)
+    finally:
+        conn.close()
+    if over_90 > 0:
+        main.send_email_alert(summary)
+    else:
+        print("No records exceeded 90% CPU usage.")
+    return 0
+
+
+def cmd_seed(args):
+    import setup_db
+
+    setup_db.create_db()
+    return 0
+
+
+def cmd_stale(args):
+    import os
+    import sqlite3
+    import setup_db
+    import staleness
+
+    if not os.path.exists(setup_db.DB_NAME):
+        print("Database not found. Please ensure log.db exists.")
+        return 1
+    conn = sqlite3.connect(setup_db.DB_NAME)
+    try:
+        setup_db.migrate_db(conn)
+        stale = staleness.StalenessTracker().refresh(conn).stale_hosts(max_missed=args.max_missed)
+        gaps = staleness.gap_segments(conn)
+    finally:
+        conn.close()
+    for row in stale:
+        print(f"⚠️ {row['host']} silent since {row['last_seen']} "
+              f"({row['missed_intervals']} missed samples)")
+    for seg in gaps:
+        print(f"Gap on {seg['host']}: {seg['gap_start']} -> {seg['gap_end']} "
+              f"({seg['missing_samples']} missing samples)")
+    if not stale and not gaps:
+        print("✅ All hosts reporting, no gaps.")
+    # Non-zero exit lets cron/monitoring alert on silent hosts
+    return 1 if stale else 0
+
+
+def cmd_hotsync(args):
+    import sqlite3
+    import time
+    import hotstore
+    import setup_db
+
+    store = hotstore.HotStore()
+    conn = sqlite3.connect(setup_db.DB_NAME)
+    try:
+        while True:
+            added = store.sync(conn)
+            if added is None:
+                print("Another process is syncing the hot store.")
+            elif added:
+                print(f"Synced {added} samples into {store.path}")
+            if store.dropped_hosts:
+                print(f"⚠️ {len(store.dropped_hosts)} hosts didn't fit in the hot store "
+                      f"(HOTSTORE_MAX_HOSTS={hotstore.MAX_HOSTS}); their samples are not buffered.")
+                store.dropped_hosts.clear()
+            if not args.interval:
+                return 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_pack(args):
+    import os
+    import sqlite3
+    import blockstore
+    import setup_db
+
+    if not os.path.exists(setup_db.DB_NAME):
+        print("Database not found. Please ensure log.db exists.")
+        return 1
+    conn = sqlite3.connect(setup_db.DB_NAME)
+    try:
+        setup_db.migrate_db(conn)
+        try:
+            packed = blockstore.pack(conn, prune=args.prune)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        stats = blockstore.storage_stats(conn)
+    finally:
+        conn.close()
+    print(f"Packed {packed} rows into {blockstore.BLOCK_TABLE}.")
+    if args.prune:
+        print("Removed every packed row from system_log; the blocks are now their only copy.")
+    blocks, samples = stats["block_bytes"], stats["block_samples"]
+    print(f"Blocks: {samples} samples in {blocks} bytes"
+          + (f" ({blocks / samples:.1f} bytes/sample)" if samples else ""))
+    raw, rows = stats["row_store_bytes"], stats["row_store_rows"]
+    if raw is not None:
+        print(f"system_log + indexes: {rows} rows in {raw} bytes"
+              + (f" ({raw / rows:.1f} bytes/row)" if rows else ""))
+    if not args.prune and samples:
+        print("Packed rows are still in system_log; pack --prune keeps them only in blocks.")
+    elif args.prune:
+        print("Run VACUUM on log.db to return the freed pages to the filesystem.")
+    return 0
+
+
+def cmd_fleet(args):
+    import federation
+
+    per_site, fleet = federation.fleet_summary()
+    failed = 0
+    for name, partial in per_site.items():
+        if isinstance(partial, Exception):
+            print(f"❌ {name}: {partial}")
+            failed += 1
+        else:
+            cpu = partial["metrics"]["cpu"]
+            avg = cpu["sum"] / cpu["count"] if cpu["count"] else 0.0
+            print(f"{name}: {partial['rows']} records, avg CPU {avg:.2f}%, max CPU {cpu['max']}")
+    print("===== Fleet =====")
+    print(f"Total Records: {fleet['rows']}")
+    for metric, m in fleet["metrics"].items():
+        if not m["count"]:
+            continue
+        p50, p95, p99 = (federation.quantile(m["sketch"], q) for q in (0.5, 0.95, 0.99))
+        print(f"{metric}: avg {m['mean']:.2f}%, max {m['max']}, alerts {m['alerts']}, "
+              f"p50 {p50} / p95 {p95} / p99 {p99}")
+    print(f"Top CPU Peaks: {[(cpu, host) for cpu, host, _ in fleet['cpu_peaks']]}")
+    return 1 if failed else 0
+
+
+def cmd_reports(args):
+    import os
+    import sqlite3
+    import time
+    import reports
+    import setup_db
+
+    if not os.path.exists(setup_db.DB_NAME):
+        print("Database not found. Please ensure log.db exists.")
+        return 1
+    conn = sqlite3.connect(setup_db.DB_NAME)
+    try:
+        setup_db.migrate_db(conn)
+        rebuild = args.rebuild
+        while True:
+            written = reports.materialize(conn, rebuild=rebuild)
+            rebuild = False
+            if any(written.values()):
+                print(f"Materialized {written['hour']} hourly and {written['day']} daily reports.")
+            # summary.txt is now a by-product of the reports, not a manual step
+            with open("summary.txt", "w", encoding="utf-8") as f:
+                f.write(reports.summary_text(conn))
+            if not args.interval:
+                return 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_loadtest(args):
+    import loadtest
+
+    results = loadtest.run_load_test(
+        sessions=args.sessions, concurrency=args.concurrency, hosts=args.hosts,
+        days=args.days, work_dir=args.work_dir, rebuild=args.rebuild, threads=args.threads,
+    )
+    return 1 if any(r["error"] for r in results) else 0
+
+
+def _median_run_ms(argv, runs):
+    import subprocess
+    import time
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def cmd_startup(args):
+    import subprocess
+
+    # Cold start of the CLI with every batch module imported, minus the bare interpreter
+    base = _median_run_ms([sys.executable, "-c", "pass"], args.runs)
+    full = _median_run_ms(
+        [sys.executable, "-c", "import cli, main, test_script, setup_db"], args.runs
+    )
+    overhead = full - base
+    print(f"Interpreter: {base:.1f} ms")
+    print(f"CLI + batch modules: {full:.1f} ms")
+    print(f"Overhead: {overhead:.1f} ms (budget {STARTUP_BUDGET_MS} ms)")
+
+    heavy = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, cli, main, test_script, setup_db; "
+         "print(' '.join(m for m in ('pandas', 'numpy', 'smtplib') if m in sys.modules))"],
+        capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    if heavy:
+        print(f"❌ Heavy modules imported at startup: {heavy}")
+        return 1
+    if overhead > STARTUP_BUDGET_MS:
+        print("❌ Startup budget exceeded")
+        return 1
+    print("✅ Startup within budget")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Data Center Monitoring System batch tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("summary", help="write summary.txt from log.db")
+    p.add_argument("--no-alert", action="store_true", help="skip the CPU alert email")
+    p.set_defaults(func=cmd_summary)
+
+    p = sub.add_parser("validate", help="run the full system test")
+    p.add_argument("--no-save", action="store_true", help="don't write test_report.txt")
+    p.add_argument("--full", action="store_true", help="ignore the checkpoint and re-scan every row")
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("alert", help="send the CPU alert if any record exceeds 90%%")
+    p.set_defaults(func=cmd_alert)
+
+    p = sub.add_parser("seed", help="create log.db with dummy data and default users")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("stale", help="list silent hosts and gaps in collection")
+    p.add_argument("--max-missed", type=int, default=3,
+                   help="samples a host may miss before it counts as stale")
+    p.set_defaults(func=cmd_stale)
+
+    p = sub.add_parser("hotsync", help="feed recent samples into the in-memory hot store")
+    p.add_argument("--interval", type=float, default=0,
+                   help="keep running, syncing every N seconds (default: sync once)")
+    p.set_defaults(func=cmd_hotsync)
+
+    p = sub.add_parser("pack", help="compress system_log rows into metric blocks")
+    p.add_argument("--prune", action="store_true",
+                   help="delete packed rows from system_log; the blocks become their only copy")
+    p.set_defaults(func=cmd_pack)
+
+    p = sub.add_parser("fleet", help="merged metrics across every site in sites.json")
+    p.set_defaults(func=cmd_fleet)
+
+    p = sub.add_parser("reports", help="materialize hourly and daily summary reports")
+    p.add_argument("--interval", type=float, default=0,
+                   help="keep running, materializing every N seconds (default: once)")
+    p.add_argument("--rebuild", action="store_true",
+                   help="recompute every report, e.g. after backfilling old samples")
+    p.set_defaults(func=cmd_reports)
+
+    p = sub.add_parser("loadtest", help="load-test the dashboard with concurrent headless sessions")
+    p.add_argument("--sessions", type=int, default=20)
+    p.add_argument("--concurrency", type=int, default=4, help="sessions running at the same time")
+    p.add_argument("--hosts", type=int, default=200, help="hosts in the synthetic log.db")
+    p.add_argument("--days", type=int, default=7, help="days of 5-minute samples per host")
+    p.add_argument("--work-dir", default="loadtest_data", help="where the synthetic log.db lives")
+    p.add_argument("--rebuild", action="store_true", help="regenerate the synthetic log.db")
+    p.add_argument("--threads", action="store_true",
+                   help="run sessions on threads of one process (shared caches, one GIL)")
+    p.set_defaults(func=cmd_loadtest)
+
+    p = sub.add_parser("startup", help="measure cold-start overhead")
+    p.add_argument("--runs", type=int, default=5)
+    p.set_defaults(func=cmd_startup)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Cross-host and cross-metric correlation over a time window.
+
+Samples are rolled up in SQL into fixed-width buckets per host (the average
+of each metric per bucket), then scattered into one aligned NumPy array of
+shape (hosts, metrics, buckets). Everything after that is vectorized:
+
+- correlation_matrix(): Pearson correlation of every series against every
+  other series as one matrix product of the standardized rows
+- rolling_correlation(): correlation of many series pairs over a sliding
+  window, from cumulative sums (O(buckets) per pair)
+- rolling_matrices(): the full correlation matrix of a few series at every
+  window position, with sliding_window_view + einsum
+
+1,000 hosts x 3 metrics x 288 buckets is a 3,000 x 3,000 matrix product,
+about a second on one core.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+TABLE_NAME = "system_log"
+METRICS = ("cpu", "memory", "disk")
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Timestamps are naive strings; bucket edges are counted from this origin
+EPOCH = datetime(1970, 1, 1)
+# Common windows: label -> (length in seconds, bucket width in seconds)
+WINDOWS = {
+    "Last hour": (3600, 300),
+    "Last 6 hours": (6 * 3600, 300),
+    "Last 24 hours": (24 * 3600, 900),
+    "Last 7 days": (7 * 24 * 3600, 3600),
+}
+
+
+def window_end(conn, step):
+    """Latest sample time (via the timestamp index), rounded up to a bucket edge,
+    so the window stays put between reruns until a new bucket opens."""
+    latest = conn.execute(f"SELECT MAX(timestamp) FROM {TABLE_NAME}").fetchone()[0]
+    if latest is None:
+        return None
+    elapsed = int((datetime.strptime(latest, TS_FORMAT) - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=(elapsed // step + 1) * step)
+
+
+def aligned_rollups(conn, start, end, step):
+    """Per-host bucket averages for start <= timestamp < end.
+
+    Returns (hosts, bucket start times, values) where values has shape
+    (len(hosts), len(METRICS), buckets) and NaN marks empty buckets.
+    """
+    n_buckets = max(1, -(-int((end - start).total_seconds()) // step))
+    rows = conn.execute(
+        f"SELECT host, (CAST(strftime('%s', timestamp) AS INTEGER) - CAST(strftime('%s', ?) AS INTEGER)) / ? AS bucket, "
+        f"{', '.join(f'AVG({m})' for m in METRICS)} FROM {TABLE_NAME} "
+        f"WHERE timestamp >= ? AND timestamp < ? GROUP BY host, bucket",
+        (start.strftime(TS_FORMAT), step, start.strftime(TS_FORMAT), end.strftime(TS_FORMAT)),
+    ).fetchall()
+
+    times = [start + timedelta(seconds=step * i) for i in range(n_buckets)]
+    if not rows:
+        return [], times, np.empty((0, len(METRICS), n_buckets))
+    hosts = sorted({r[0] for r in rows})
+    index = {h: i for i, h in enumerate(hosts)}
+    host_idx = np.fromiter((index[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+    bucket_idx = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    data = np.array([r[2:] for r in rows], dtype=np.float64)
+
+    values = np.full((len(hosts), len(METRICS), n_buckets), np.nan)
+    keep = (bucket_idx >= 0) & (bucket_idx < n_buckets)
+    for m in range(len(METRICS)):
+        values[host_idx[keep], m, bucket_idx[keep]] = data[keep, m]
+    return hosts, times, values
+
+
+def fill_gaps(series):
+    """Forward-fills NaNs along the last axis (back-filling leading NaNs), vectorized."""
+    x = np.asarray(series, dtype=np.float64)
+    flat = x.reshape(-1, x.shape[-1])
+    valid = ~np.isnan(flat)
+    n = flat.shape[1]
+    # Index of the last valid bucket at or before each position
+    idx = np.where(valid, np.arange(n), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = flat[np.arange(flat.shape[0])[:, None], idx]
+    # Leading gaps take the first valid value of the series
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), 0)
+    lead = np.arange(n) < first[:, None]
+    filled = np.where(lead, flat[np.arange(flat.shape[0]), first][:, None], filled)
+    return filled.reshape(x.shape)
+
+
+def _standardize(x, axis=-1):
+    centered = x - x.mean(axis=axis, keepdims=True)
+    std = centered.std(axis=axis, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Flat series have no defined correlation
+        return np.where(std > 0, centered / std, np.nan)
+
+
+def correlation_matrix(series):
+    """Pearson correlation of the rows of a (series, buckets) array."""
+    z = _standardize(np.asarray(series, dtype=np.float64))
+    return (z @ z.T) / z.shape[1]
+
+
+def cross_metric(values):
+    """Correlation between the metrics of each host: (hosts, metrics, metrics)."""
+    z = _standardize(values)
+    return np.einsum("hit,hjt->hij", z, z) / values.shape[-1]
+
+
+def top_pairs(matrix, labels, k=10, absolute=True):
+    """The k most correlated distinct pairs: [(label a, label b, correlation)]."""
+    n = matrix.shape[0]
+    rows, cols = np.triu_indices(n, k=1)
+    scores = matrix[rows, cols]
+    scores = np.where(np.isnan(scores), -np.inf, np.abs(scores) if absolute else scores)
+    k = min(k, len(scores))
+    if k == 0:
+        return []
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return [
+        (labels[rows[i]], labels[cols[i]], float(matrix[rows[i], cols[i]]))
+        for i in best if np.isfinite(scores[i])
+    ]
+
+
+def rolling_correlation(x, y, window):
+    """Correlation of x[p] and y[p] over every `window`-bucket span.
+
+    x and y are (pairs, buckets) (or 1-D); returns (pairs, buckets - window + 1).
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    # Centering first keeps the cumulative sums small (less cancellation)
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+
+    def window_sums(a):
+        c = np.cumsum(np.pad(a, ((0, 0), (1, 0))), axis=1)
+        return c[:, window:] - c[:, :-window]
+
+    sx, sy = window_sums(x), window_sums(y)
+    cov = window_sums(x * y) - sx * sy / window
+    var_x = window_sums(x * x) - sx * sx / window
+    var_y = window_sums(y * y) - sy * sy / window
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denom = np.sqrt(var_x * var_y)
+        return np.where(denom > 1e-9, cov / denom, np.nan)
+
+
+def rolling_matrices(series, window, stride=1):
+    """Correlation matrix of a few series at every window position:
+    (positions, series, series)."""
+    views = sliding_window_view(np.asarray(series, dtype=np.float64), window, axis=1)[:, ::stride]
+    z = _standardize(views)
+    return np.einsum("iwt,jwt->wij", z, z) / window
+
+
+def analyze(conn, window="Last 24 hours", top_k=10, end=None):
+    """Correlations over one of WINDOWS, ending at `end` (default: window_end())."""
+    length, step = WINDOWS[window]
+    end = end or window_end(conn, step)
+    if end is None:
+        return None
+    start = end - timedelta(seconds=length)
+    hosts, times, values = aligned_rollups(conn, start, end, step)
+    filled = fill_gaps(values)
+    labels = [f"{h}:{m}" for h in hosts for m in METRICS]
+    matrix = correlation_matrix(filled.reshape(len(hosts) * len(METRICS), -1))
+    per_host = cross_metric(filled)
+    return {
+        "window": window,
+        "start": start,
+        "end": end,
+        "step": step,
+        "hosts": hosts,
+        "times": times,
+        "values": filled,
+        "coverage": float(np.mean(~np.isnan(values))) if values.size else 0.0,
+        "labels": labels,
+        "matrix": matrix,
+        "cross_metric": per_host,
+        "pairs": top_pairs(matrix, labels, top_k),
+    }
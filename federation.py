@@ -0,0 +1,147 @@
+"""Federated queries across several data-center databases.
+
+Sites are listed in `sites.json` ({"sites": [{"name": ..., "path": ...}]});
+without it the local log.db is the only site. Queries fan out to every site
+on a thread pool (sqlite3 releases the GIL while a query runs, so a fleet
+query costs about as much as the slowest site) and each site returns a
+partial aggregate that merge_partials() combines:
+
+- means are weighted by sample count (sum / count, never mean of means)
+- max is the global max, alert counts are summed
+- top-K peaks are merged with heapq.nlargest over the per-site top-K
+- percentiles come from a mergeable histogram sketch with 0.1% bins
+"""
+import heapq
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from setup_db import DB_NAME, DEFAULT_HOST, HOST_COLUMN
+
+SITES_FILE = "sites.json"
+TABLE_NAME = "system_log"
+METRICS = ("cpu", "memory", "disk")
+# Sketch resolution: metrics are percentages stored with one decimal
+SKETCH_BINS_PER_UNIT = 10
+SKETCH_MAX = 100
+
+
+def load_sites(path=SITES_FILE):
+    """[(name, db path)] of registered sites, in file order."""
+    if not os.path.isfile(path):
+        return [("local", DB_NAME)]
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return [(site["name"], site["path"]) for site in config["sites"]]
+
+
+class Federation:
+    def __init__(self, sites=None, max_workers=None):
+        self.sites = sites if sites is not None else load_sites()
+        self.max_workers = max_workers or max(1, len(self.sites))
+
+    def map(self, fn, sites=None):
+        """Runs fn(conn) on every site in parallel. Returns {site: result}; a site
+        that is missing or fails maps to its exception instead."""
+        sites = self.sites if sites is None else [s for s in self.sites if s[0] in sites]
+
+        def run(site):
+            name, path = site
+            if not os.path.exists(path):
+                return name, FileNotFoundError(f"Database not found: {path}")
+            conn = sqlite3.connect(path)
+            try:
+                return name, fn(conn)
+            except Exception as e:
+                return name, e
+            finally:
+                conn.close()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(pool.map(run, sites))
+
+
+def site_partial(conn, thresholds=None, top_k=3):
+    """Partial aggregate of one site: counts, sums, maxima, alert counts,
+    top-K CPU peaks and a histogram sketch per metric."""
+    thresholds = thresholds or {"cpu": 80, "memory": 85, "disk": 90}
+    select = ["COUNT(*)"]
+    params = []
+    for m in METRICS:
+        select += [f"COUNT({m})", f"SUM({m})", f"MAX({m})", f"SUM(CASE WHEN {m} > ? THEN 1 ELSE 0 END)"]
+        params.append(thresholds[m])
+    row = conn.execute(f"SELECT {', '.join(select)} FROM {TABLE_NAME}", params).fetchone()
+
+    partial = {"rows": row[0], "metrics": {}}
+    for i, m in enumerate(METRICS):
+        count, total, peak, alerts = row[1 + 4 * i:5 + 4 * i]
+        sketch = dict(conn.execute(
+            f"SELECT MIN(MAX(CAST(ROUND({m} * ?) AS INTEGER), 0), ?), COUNT(*) "
+            f"FROM {TABLE_NAME} WHERE {m} IS NOT NULL GROUP BY 1",
+            (SKETCH_BINS_PER_UNIT, SKETCH_MAX * SKETCH_BINS_PER_UNIT),
+        ).fetchall())
+        partial["metrics"][m] = {
+            "count": count,
+            "sum": total or 0.0,
+            "max": peak,
+            "alerts": alerts or 0,
+            "sketch": sketch,
+        }
+    # Sites are only read, never migrated: a pre-host schema is all DEFAULT_HOST,
+    # as migrate_db() would backfill it
+    cols = [r[1] for r in conn.execute(f"PRAGMA table_info({TABLE_NAME})").fetchall()]
+    host = HOST_COLUMN if HOST_COLUMN in cols else "?"
+    partial["cpu_peaks"] = conn.execute(
+        f"SELECT cpu, {host}, timestamp FROM {TABLE_NAME} WHERE cpu IS NOT NULL "
+        "ORDER BY cpu DESC LIMIT ?",
+        ((DEFAULT_HOST,) if host == "?" else ()) + (top_k,),
+    ).fetchall()
+    return partial
+
+
+def quantile(sketch, q):
+    """q-quantile (0..1) from a histogram sketch {bin: count}."""
+    total = sum(sketch.values())
+    if not total:
+        return None
+    target = q * (total - 1)
+    seen = 0
+    for b in sorted(sketch):
+        seen += sketch[b]
+        if seen > target:
+            return b / SKETCH_BINS_PER_UNIT
+    return max(sketch) / SKETCH_BINS_PER_UNIT
+
+
+def merge_partials(partials, top_k=3):
+    """Combines site partials (ignoring failed sites) into one fleet aggregate."""
+    ok = [p for p in partials if isinstance(p, dict)]
+    fleet = {"rows": sum(p["rows"] for p in ok), "metrics": {}}
+    for m in METRICS:
+        parts = [p["metrics"][m] for p in ok]
+        count = sum(p["count"] for p in parts)
+        sketch = {}
+        for p in parts:
+            for b, n in p["sketch"].items():
+                sketch[b] = sketch.get(b, 0) + n
+        maxima = [p["max"] for p in parts if p["max"] is not None]
+        fleet["metrics"][m] = {
+            "count": count,
+            "sum": sum(p["sum"] for p in parts),
+            "mean": sum(p["sum"] for p in parts) / count if count else None,
+            "max": max(maxima) if maxima else None,
+            "alerts": sum(p["alerts"] for p in parts),
+            "sketch": sketch,
+        }
+    fleet["cpu_peaks"] = heapq.nlargest(
+        top_k, (peak for p in ok for peak in p["cpu_peaks"]), key=lambda r: r[0]
+    )
+    return fleet
+
+
+def fleet_summary(federation=None, thresholds=None, top_k=3):
+    """Runs site_partial() everywhere and returns ({site: partial or error}, fleet)."""
+    federation = federation or Federation()
+    per_site = federation.map(lambda conn: site_partial(conn, thresholds, top_k))
+    return per_site, merge_partials(per_site.values(), top_k)
@@ -0,0 +1,263 @@
+"""Memory-mapped ring buffer holding the most recent samples per host.
+
+The hot store is a single fixed-size file (point HOTSTORE_PATH at /dev/shm to
+keep it in shared memory) laid out as NumPy arrays:
+
+    header   int64[8]                      magic, version, max hosts, capacity, last synced id,
+                                           samples dropped (host had no free slot)
+    updated  float64[1]                    time of the last sync (epoch seconds)
+    hosts    S64[MAX_HOSTS]                host name per slot
+    heads    int64[MAX_HOSTS]              samples ever written per slot
+    seqs     int64[MAX_HOSTS]              seqlock counter per slot (odd while writing)
+    ts       int64[MAX_HOSTS, CAPACITY]    sample time, epoch seconds
+    values   float64[MAX_HOSTS, 3, CAPACITY]  cpu, memory, disk
+
+Every process maps the same file, so dashboard sessions read recent windows
+without going to SQLite. Writes (sync from log.db) take an exclusive flock,
+so only one process ingests at a time; readers never lock and retry if a
+slot's seqlock changed under them.
+
+The store holds HOTSTORE_MAX_HOSTS hosts (1,024 by default, about 10 MB).
+Samples of hosts beyond that are not buffered; dropped() counts them.
+"""
+import fcntl
+import os
+import time
+
+import numpy as np
+
+from setup_db import issued_id
+
+HOTSTORE_PATH = os.environ.get("HOTSTORE_PATH", "hotstore.bin")
+TABLE_NAME = "system_log"
+METRICS = ("cpu", "memory", "disk")
+MAX_HOSTS = int(os.environ.get("HOTSTORE_MAX_HOSTS", 1024))
+# 24 hours of 5-minute samples
+CAPACITY = 288
+MAGIC = 0x484F5453544F5245  # "HOTSTORE"
+VERSION = 1
+# Seqlock read attempts, with a growing sleep between them, before window()
+# falls back to its last consistent read
+READ_RETRIES = 8
+
+
+def _layout(max_hosts, capacity):
+    fields = [
+        ("header", np.int64, (8,)),
+        ("updated", np.float64, (1,)),
+        ("hosts", "S64", (max_hosts,)),
+        ("heads", np.int64, (max_hosts,)),
+        ("seqs", np.int64, (max_hosts,)),
+        ("ts", np.int64, (max_hosts, capacity)),
+        ("values", np.float64, (max_hosts, len(METRICS), capacity)),
+    ]
+    offsets, offset = {}, 0
+    for name, dtype, shape in fields:
+        dtype = np.dtype(dtype)
+        offsets[name] = (offset, dtype, shape)
+        offset += dtype.itemsize * int(np.prod(shape))
+        offset = (offset + 63) // 64 * 64
+    return offsets, offset
+
+
+class HotStore:
+    def __init__(self, path=HOTSTORE_PATH, max_hosts=MAX_HOSTS, capacity=CAPACITY):
+        self.path = path
+        layout, size = _layout(max_hosts, capacity)
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            self._create(size)
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r+", shape=(size,))
+        for name, (offset, dtype, shape) in layout.items():
+            setattr(self, f"_{name}", np.ndarray(shape, dtype=dtype, buffer=self._mm, offset=offset))
+        if self._header[0] != MAGIC:
+            with self._write_lock():
+                if self._header[0] != MAGIC:
+                    self._header[:5] = (MAGIC, VERSION, max_hosts, capacity, 0)
+        self.capacity = capacity
+        self._slots = {}
+        # Last consistent window() result per (host, n), served if a writer stalls
+        self._last_read = {}
+        # Hosts this process couldn't give a slot to
+        self.dropped_hosts = set()
+
+    def _create(self, size):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+        os.replace(tmp, self.path)
+
+    def _write_lock(self):
+        return _FileLock(f"{self.path}.lock")
+
+    # --- writer side ---
+
+    def _slot(self, host, create=False):
+        key = host.encode("utf-8")[:64]
+        slot = self._slots.get(host)
+        # The cached slot is dropped if another process reset the store
+        if slot is not None and self._hosts[slot] == key:
+            return slot
+        for i, name in enumerate(self._hosts):
+            if name == key:
+                self._slots[host] = i
+                return i
+            if not name:
+                if not create:
+                    return None
+                self._hosts[i] = key
+                self._slots[host] = i
+                return i
+        return None
+
+    def _append(self, slot, ts, values):
+        # `values` are already floats: nothing below can fail half-way through
+        self._seqs[slot] += 1
+        try:
+            pos = self._heads[slot] % self.capacity
+            self._ts[slot, pos] = ts
+            self._values[slot, :, pos] = values
+            self._heads[slot] += 1
+        finally:
+            self._seqs[slot] += 1
+
+    def _reset(self):
+        self._hosts[:] = b""
+        self._heads[:] = 0
+        self._seqs[:] += 2
+        self._header[4] = 0
+        self._header[5] = 0
+        self._slots.clear()
+        self.dropped_hosts.clear()
+
+    def sync(self, conn, batch=10000):
+        """Appends rows inserted into log.db since the last sync. Returns rows added,
+        or None if another process is already syncing."""
+        lock = self._write_lock()
+        if not lock.acquire(blocking=False):
+            return None
+        added = 0
+        try:
+            # log.db was recreated: ids restarted, so the buffered samples are stale
+            if issued_id(conn) < self._header[4]:
+                self._reset()
+            # We hold the lock, so an odd seqlock was left by a writer that died mid-append
+            self._seqs[self._seqs % 2 == 1] += 1
+            while True:
+                rows = conn.execute(
+                    f"SELECT id, host, CAST(strftime('%s', timestamp) AS INTEGER), "
+                    f"{', '.join(METRICS)} FROM {TABLE_NAME} WHERE id > ? ORDER BY id LIMIT ?",
+                    (int(self._header[4]), batch),
+                ).fetchall()
+                for row_id, host, ts, *values in rows:
+                    self._header[4] = row_id
+                    # Only samples that get stored claim a slot: a host whose
+                    # timestamps never parse isn't listed with no data
+                    if ts is None:
+                        continue
+                    slot = self._slot(host or "", create=True)
+                    if slot is None:
+                        self._header[5] += 1
+                        self.dropped_hosts.add(host or "")
+                        continue
+                    self._append(slot, ts, [_to_float(v) for v in values])
+                added += len(rows)
+                if len(rows) < batch:
+                    break
+            self._updated[0] = time.time()
+            self._mm.flush()
+        finally:
+            lock.release()
+        return added
+
+    # --- reader side ---
+
+    def age(self):
+        """Seconds since the store was last synced (inf if never)."""
+        updated = float(self._updated[0])
+        return time.time() - updated if updated else float("inf")
+
+    def hosts(self):
+        return [h.decode("utf-8") for h in self._hosts if h]
+
+    def dropped(self):
+        """Samples not buffered because every host slot was taken."""
+        return int(self._header[5])
+
+    def _empty(self):
+        return np.array([], dtype="datetime64[s]"), np.empty((len(METRICS), 0))
+
+    def window(self, host, n=None):
+        """The last `n` samples of `host` (all buffered ones by default), oldest first.
+
+        Returns (timestamps as datetime64[s], values shaped (len(METRICS), k)),
+        copied out of the shared mapping while the slot's seqlock was stable. If a
+        writer holds the slot through every retry, the last consistent read of
+        the same window is returned instead (empty if there is none).
+        """
+        slot = self._slot(host)
+        if slot is None:
+            return self._empty()
+        for attempt in range(READ_RETRIES):
+            seq = self._seqs[slot]
+            if seq % 2 == 0:
+                head = int(self._heads[slot])
+                k = min(head, self.capacity, n or self.capacity)
+                start = (head - k) % self.capacity
+                if start + k <= self.capacity:
+                    ts = self._ts[slot, start:start + k].copy()
+                    values = self._values[slot, :, start:start + k].copy()
+                else:
+                    idx = np.arange(head - k, head) % self.capacity
+                    ts = self._ts[slot, idx]
+                    values = self._values[slot][:, idx]
+                if self._seqs[slot] == seq:
+                    self._last_read[(host, n)] = (ts.view("datetime64[s]"), values)
+                    return self._last_read[(host, n)]
+            # A writer is mid-append, possibly descheduled: back off (1 ms, 2 ms, ... 20 ms)
+            time.sleep(min(0.001 * 2 ** attempt, 0.02))
+        # Still changing: serve the last consistent read rather than fail the page
+        return self._last_read.get((host, n)) or self._empty()
+
+    def latest(self, host):
+        """Most recent sample of `host` as a dict, or None."""
+        ts, values = self.window(host, 1)
+        if not len(ts):
+            return None
+        return {"timestamp": ts[0], **{m: float(values[i, 0]) for i, m in enumerate(METRICS)}}
+
+
+def _to_float(value):
+    # NULLs and text that isn't a number are stored as NaN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(self._fd)
+            self._fd = None
+            return False
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,113 @@
+"""Incrementally maintained "hottest hosts" leaderboard.
+
+For every metric the leaderboard ranks hosts by their current value and by
+the average of their last ROLLING_SAMPLES samples. Rankings are kept in
+sorted lists updated with bisect on each sample, so ingesting a sample is a
+binary search per ranking instead of re-sorting history, and reading the
+top K is a slice.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from math import fsum
+
+from setup_db import issued_id
+
+TABLE_NAME = "system_log"
+METRICS = ("cpu", "memory", "disk")
+LABELS = {"cpu": "CPU", "memory": "Memory", "disk": "Disk"}
+KINDS = ("current", "rolling")
+# One hour of 5-minute samples
+ROLLING_SAMPLES = 12
+
+
+def _number(value):
+    # NULL, NaN and non-numeric text are treated as missing
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+
+class Leaderboard:
+    def __init__(self, window=ROLLING_SAMPLES):
+        self.window = window
+        self._reset()
+        # One leaderboard is shared by every dashboard session in the process
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self.last_id = 0
+        self._latest_ts = {}
+        self._recent = {}
+        # (metric, kind) -> {host: score} and the matching sorted [(-score, host)]
+        self._scores = {(m, k): {} for m in METRICS for k in KINDS}
+        self._ranked = {(m, k): [] for m in METRICS for k in KINDS}
+
+    def _set_score(self, key, host, score):
+        scores, ranked = self._scores[key], self._ranked[key]
+        old = scores.get(host)
+        if old is not None:
+            del ranked[bisect_left(ranked, (-old, host))]
+        scores[host] = score
+        insort(ranked, (-score, host))
+
+    def update(self, host, timestamp, cpu, memory, disk):
+        """Feeds one sample (in ingestion order). Values that aren't numbers don't score."""
+        values = (_number(cpu), _number(memory), _number(disk))
+        recent = self._recent.get(host)
+        if recent is None:
+            recent = self._recent[host] = deque(maxlen=self.window)
+        recent.append(values)
+
+        is_latest = timestamp is None or timestamp >= self._latest_ts.get(host, "")
+        if is_latest and timestamp is not None:
+            self._latest_ts[host] = timestamp
+        for i, metric in enumerate(METRICS):
+            if is_latest and values[i] is not None:
+                self._set_score((metric, "current"), host, values[i])
+            # fsum over the (fixed-size) window rather than a running sum, which
+            # drifts and would make the average depend on how much history was fed
+            window_values = [r[i] for r in recent if r[i] is not None]
+            if window_values:
+                self._set_score((metric, "rolling"), host, fsum(window_values) / len(window_values))
+
+    def refresh(self, conn):
+        """Feeds rows inserted since the previous refresh. The first refresh only
+        reads the last `window` samples of each host, not the whole history."""
+        with self._lock:
+            # log.db was recreated: ids restarted, so the rankings are stale
+            if issued_id(conn) < self.last_id:
+                self._reset()
+            if self.last_id == 0:
+                rows = conn.execute(
+                    f"SELECT id, host, timestamp, {', '.join(METRICS)} FROM ("
+                    f"SELECT *, ROW_NUMBER() OVER (PARTITION BY host ORDER BY timestamp DESC, id DESC) AS rn "
+                    f"FROM {TABLE_NAME}) WHERE rn <= ? ORDER BY timestamp, id",
+                    (self.window,),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT id, host, timestamp, {', '.join(METRICS)} FROM {TABLE_NAME} "
+                    "WHERE id > ? ORDER BY id",
+                    (self.last_id,),
+                ).fetchall()
+            for row_id, host, ts, *values in rows:
+                self.update(host, ts, *values)
+                self.last_id = max(self.last_id, row_id)
+        return self
+
+    def top(self, metric, kind="current", k=5):
+        """[(host, score)] for the k highest-scoring hosts."""
+        return [(host, -neg) for neg, host in self._ranked[(metric, kind)][:k]]
+
+    def summary_lines(self, k=3):
+        lines = []
+        for metric in METRICS:
+            for kind, label in (("current", "current"), ("rolling", f"last {self.window} samples avg")):
+                leaders = self.top(metric, kind, k)
+                if leaders:
+                    ranked = ", ".join(f"{host} {score:.1f}%" for host, score in leaders)
+                    lines.append(f"Top {k} Hosts by {LABELS[metric]} ({label}): {ranked}")
+        return lines
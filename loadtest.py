@@ -0,0 +1,256 @@
+"""Load test for the Streamlit dashboard.
+
+Builds a synthetic log.db (many hosts, days of 5-minute samples) in a work
+directory and drives headless sessions of app.py against it with Streamlit's
+AppTest: login, Dashboard, Networking filter changes, Configuration and back
+to the Dashboard with the new thresholds.
+
+Sessions run `concurrency` at a time, either
+- each in a fresh worker process (the default): caches start cold (the worst
+  case, as after a server restart) and the process's peak RSS is the
+  session's own, or
+- on threads of this process (`threads=True`), like sessions of one
+  `streamlit run` server: they share st.cache_data/st.cache_resource and the
+  GIL, and peak RSS is the whole process's.
+
+Per rerun the harness records render latency and the SQL statements the app
+issued (counted with a sqlite3 trace callback and attributed to the session
+whose script thread ran them); per session it records peak memory.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from setup_db import DB_NAME, DEFAULT_USERS, SAMPLE_INTERVAL_MINUTES, create_schema, seed_users
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+WORK_DIR = "loadtest_data"
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+PERCENTILES = (50, 95, 99)
+# Statements that don't touch data (transaction control)
+_TX_PREFIXES = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+# Session state key naming the session a script run belongs to
+SESSION_KEY = "_loadtest_session"
+
+# session id -> statements issued since the session's last reset
+_query_counts = {}
+_counter_lock = threading.Lock()
+
+
+def build_db(path, hosts=200, days=7, seed=0):
+    """Writes a synthetic log.db with `hosts` hosts and `days` of samples ending now."""
+    import reports
+    from datetime import datetime, timedelta
+
+    if os.path.exists(path):
+        os.remove(path)
+    rng = np.random.default_rng(seed)
+    samples = days * 24 * 60 // SAMPLE_INTERVAL_MINUTES
+    end = datetime.now().replace(second=0, microsecond=0)
+    names = [f"dc{h % 4 + 1}-node-{h:04d}" for h in range(hosts)]
+
+    conn = sqlite3.connect(path)
+    try:
+        create_schema(conn)
+        seed_users(conn)
+        # Per-host baseline plus a random walk, so series look like real load
+        base = rng.uniform([10, 20, 30], [60, 70, 70], size=(hosts, 3))
+        walk = np.zeros((hosts, 3))
+        for i in range(samples):
+            walk = np.clip(walk + rng.normal(0, 1.5, size=(hosts, 3)), -25, 25)
+            values = np.clip(base + walk + rng.normal(0, 3, size=(hosts, 3)), 0, 100).round(1)
+            ts = (end - timedelta(minutes=(samples - 1 - i) * SAMPLE_INTERVAL_MINUTES)).strftime(TS_FORMAT)
+            conn.executemany(
+                "INSERT INTO system_log (timestamp, cpu, memory, disk, host) VALUES (?, ?, ?, ?, ?)",
+                [(ts, *row, name) for name, row in zip(names, values.tolist())],
+            )
+        conn.commit()
+        # A deployed database already has its reports; don't time the backfill
+        reports.materialize(conn)
+    finally:
+        conn.close()
+    return hosts * samples
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else None
+
+
+def _rss_kb():
+    # Peak resident set size of this process so far (Linux reports KiB)
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _find(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _last_day(at):
+    date_range = _find(at.sidebar.date_input, "Date range")
+    date_range.set_value((date_range.value[1], date_range.value[1]))
+
+
+def _install_query_counter():
+    """Counts statements on every connection opened from now on (once per process)."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    with _counter_lock:
+        if getattr(sqlite3.connect, "_loadtest_counter", False):
+            return
+        real_connect = sqlite3.connect
+
+        def _count(statement):
+            if statement.lstrip().upper().startswith(_TX_PREFIXES):
+                return
+            # Statements run on the script thread of the session that issued them,
+            # even on connections shared through st.cache_resource
+            ctx = get_script_run_ctx(suppress_warning=True)
+            session = ctx.session_state[SESSION_KEY] if ctx and SESSION_KEY in ctx.session_state else None
+            with _counter_lock:
+                _query_counts[session] = _query_counts.get(session, 0) + 1
+
+        def counting_connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(_count)
+            return conn
+
+        counting_connect._loadtest_counter = True
+        sqlite3.connect = counting_connect
+
+
+def _steps(username, password):
+    """(name, action) pairs of one scripted session; each action triggers one rerun."""
+
+    def login(at):
+        at.text_input(key="username").input(username)
+        # The password field's on_change runs check_password
+        at.text_input(key="password").input(password)
+
+    return [
+        ("open", lambda at: None),
+        ("login + dashboard", login),
+        ("dashboard rerun", lambda at: None),
+        ("networking", lambda at: at.sidebar.radio[0].set_value("Networking")),
+        ("filter: last day", _last_day),
+        ("filter: cpu > 50", lambda at: _find(at.sidebar.slider, "CPU Threshold (%)").set_value(50)),
+        ("configuration", lambda at: at.sidebar.radio[0].set_value("Configuration")),
+        ("set cpu threshold", lambda at: _find(at.slider, "CPU Alert Threshold (%)").set_value(70)),
+        ("dashboard (custom thresholds)", lambda at: at.sidebar.radio[0].set_value("Dashboard")),
+    ]
+
+
+def run_session(session_id, work_dir, app_path=APP_PATH, username=None, password=None, timeout=120):
+    """Runs one scripted session in this process. Returns its per-rerun timings,
+    query counts and peak memory."""
+    from streamlit.testing.v1 import AppTest
+
+    username, password = username or DEFAULT_USERS[0][0], password or DEFAULT_USERS[0][1]
+    # Threaded sessions all pass the same directory, so this is a no-op after the first
+    os.chdir(work_dir)
+    if os.path.dirname(app_path) not in sys.path:
+        sys.path.insert(0, os.path.dirname(app_path))
+    _install_query_counter()
+
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    at.session_state[SESSION_KEY] = session_id
+    base_rss = None
+    result = {"session": session_id, "steps": [], "error": None}
+    for name, action in _steps(username, password):
+        try:
+            action(at)
+            with _counter_lock:
+                _query_counts[session_id] = 0
+            start = time.perf_counter()
+            at.run()
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            result["error"] = f"{name}: {e}"
+            break
+        result["steps"].append((name, elapsed, _query_counts.get(session_id, 0)))
+        # Baseline: the login page rendered, app imports loaded
+        base_rss = base_rss or _rss_kb()
+        if at.exception:
+            result["error"] = f"{name}: {at.exception[0].value}"
+            break
+        if name.startswith("login") and not at.session_state["logged_in"]:
+            result["error"] = "login failed"
+            break
+    result["base_rss_kb"] = base_rss or _rss_kb()
+    result["peak_rss_kb"] = _rss_kb()
+    return result
+
+
+def run_load_test(sessions=20, concurrency=4, hosts=200, days=7, work_dir=WORK_DIR, rebuild=False,
+                  threads=False):
+    """Runs `sessions` sessions, `concurrency` at a time, in worker processes or
+    (with `threads`) on threads of this process. Returns the session results."""
+    work_dir = os.path.abspath(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    db_path = os.path.join(work_dir, DB_NAME)
+    if rebuild or not os.path.exists(db_path):
+        print(f"Building {db_path} ({hosts} hosts, {days} days)...")
+        rows = build_db(db_path, hosts, days)
+        print(f"  {rows} samples")
+
+    start = time.perf_counter()
+    if threads:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(run_session, range(sessions), [work_dir] * sessions))
+    else:
+        # One process per session (max_tasks_per_child needs Python 3.11+)
+        with ProcessPoolExecutor(max_workers=concurrency, max_tasks_per_child=1) as pool:
+            results = list(pool.map(run_session, range(sessions), [work_dir] * sessions))
+    wall = time.perf_counter() - start
+    print_report(results, concurrency, wall, threads)
+    return results
+
+
+def print_report(results, concurrency, wall, threads=False):
+    ok = [r for r in results if not r["error"]]
+    mode = "threads in one process" if threads else "one process each"
+    print(f"===== Load Test: {len(results)} sessions, {concurrency} concurrent ({mode}), {wall:.1f}s =====")
+    for r in results:
+        if r["error"]:
+            print(f"❌ session {r['session']}: {r['error']}")
+
+    names = [name for name, _ in _steps("", "")]
+    print(f"{'Rerun':32} {'n':>4} " + " ".join(f"{'p' + str(q):>8}" for q in PERCENTILES) + f" {'queries':>8}")
+    all_times, all_queries = [], []
+    for name in names:
+        samples = [(t, q) for r in results for step, t, q in r["steps"] if step == name]
+        if not samples:
+            continue
+        times = [t for t, _ in samples]
+        counts = [q for _, q in samples]
+        all_times += times
+        all_queries += counts
+        print(f"{name:32} {len(times):>4} "
+              + " ".join(f"{_percentile(times, q) * 1000:>6.0f}ms" for q in PERCENTILES)
+              + f" {np.mean(counts):>8.1f}")
+    if all_times:
+        print(f"{'all reruns':32} {len(all_times):>4} "
+              + " ".join(f"{_percentile(all_times, q) * 1000:>6.0f}ms" for q in PERCENTILES)
+              + f" {np.mean(all_queries):>8.1f}")
+        print(f"DB queries per rerun: mean {np.mean(all_queries):.1f}, max {max(all_queries)}")
+
+    if ok and threads:
+        # Every session reports the same process; its peak covers them all
+        peak = max(r["peak_rss_kb"] for r in ok) / 1024
+        base = min(r["base_rss_kb"] for r in ok) / 1024
+        print(f"Peak memory of the process: {peak:.0f} MiB ({peak - base:.0f} MiB beyond the first login page)")
+    elif ok:
+        peaks = [r["peak_rss_kb"] / 1024 for r in ok]
+        grown = [(r["peak_rss_kb"] - r["base_rss_kb"]) / 1024 for r in ok]
+        print(f"Peak memory per session: p50 {_percentile(peaks, 50):.0f} MiB, max {max(peaks):.0f} MiB "
+              f"(beyond the login page: p50 {_percentile(grown, 50):.0f} MiB, max {max(grown):.0f} MiB)")
+    print(f"Throughput: {len(ok) / wall:.2f} sessions/s, {len(ok)} ok, {len(results) - len(ok)} failed")
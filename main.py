@@ -1,9 +1,12 @@
 import sqlite3
-import pandas as pd
-import smtplib
-from email.mime.text import MIMEText
 import os
 
+from leaderboard import METRICS, Leaderboard
+from setup_db import DEFAULT_HOST, migrate_db
+
+# pandas and smtplib/email are imported inside the functions that need them:
+# pandas alone costs ~0.5s to import, which dominates short cron runs.
+
 DB_NAME = "log.db"
 
 # TODO: Define your bonus features here
@@ -12,6 +15,8 @@ DB_NAME = "log.db"
 # Example 3: Generate text summary report with top 3 CPU peaks
 
 def load_data():
+    import pandas as pd
+
     if not os.path.exists(DB_NAME):
         print("Database not found. Please ensure log.db exists.")
         return None
@@ -21,6 +26,8 @@ def load_data():
     return df
 
 def count_high_cpu(df):
+    import pandas as pd
+
     # Try to find a CPU column (case-insensitive common names)
     cpu_cols = [c for c in df.columns if c.lower() in ("cpu", "cpu_usage", "cpu%", "cpu_pct", "usage_cpu")]
     if not cpu_cols:
@@ -38,6 +45,8 @@ def count_high_cpu(df):
     return {"cpu_col": cpu_col, ">80": count_over_80, ">90": count_over_90}
 
 def generate_summary(df):
+    import pandas as pd
+
     # Build a text summary containing metrics requested in the spec
     total = len(df)
 
@@ -50,8 +59,8 @@ def generate_summary(df):
     avg_cpu = float(df[cpu_col].mean()) if total > 0 else 0.0
     max_cpu = float(df[cpu_col].max()) if total > 0 else 0.0
 
-    # Top 3 peaks
-    peaks = df[cpu_col].dropna().sort_values(ascending=False).head(3).tolist()
+    # Top 3 peaks (partial selection, no full sort)
+    peaks = df[cpu_col].dropna().nlargest(3).tolist()
 
     # Network DOWN count: try to detect a network/status column
     net_cols = [c for c in df.columns if "network" in c.lower() or "status" == c.lower()]
@@ -60,6 +69,29 @@ def generate_summary(df):
         col = net_cols[0]
         net_down_count = int(df[col].astype(str).str.lower().str.contains("down").sum())
 
+    # Hottest hosts: feed each host's last `window` samples in time order, as the
+    # SQL path does; older samples can't affect either ranking
+    board = Leaderboard()
+    ordered = df.sort_values([c for c in ("timestamp", "id") if c in df.columns]) if total else df
+    if "host" in ordered.columns:
+        ordered = ordered.groupby("host", sort=False, dropna=False).tail(board.window)
+    else:
+        ordered = ordered.tail(board.window)
+    hosts = ordered["host"] if "host" in ordered.columns else [DEFAULT_HOST] * len(ordered)
+    timestamps = ordered["timestamp"].astype(str) if "timestamp" in ordered.columns else [None] * len(ordered)
+    metric_cols = [
+        pd.to_numeric(ordered[m], errors="coerce").astype(object).where(ordered[m].notna(), None)
+        if m in ordered.columns else [None] * len(ordered)
+        for m in METRICS
+    ]
+    for host, ts, *values in zip(hosts, timestamps, *metric_cols):
+        board.update(host, ts, *values)
+
+    return format_summary(
+        total, avg_cpu, max_cpu, net_down_count, peaks, cpu_info[">90"], board.summary_lines()
+    )
+
+def format_summary(total, avg_cpu, max_cpu, net_down_count, peaks, over_90, leader_lines=()):
     summary_lines = [
         "**System Summary**",
         f"Total Records: {total}",
@@ -67,12 +99,51 @@ def generate_summary(df):
         f"Maximum CPU Usage: {max_cpu}",
         f"Network DOWN count: {net_down_count}",
         f"Top 3 CPU Peaks: {peaks}",
-        f"⚠️ ALERT: {cpu_info['>90']} records exceeded 90% CPU usage.",
+        f"⚠️ ALERT: {over_90} records exceeded 90% CPU usage.",
+        *leader_lines,
     ]
 
     summary_text = "\n\n".join(summary_lines)
     return summary_text
 
+def summarize_db(conn):
+    """Same summary as generate_summary(), computed with SQL aggregates (no pandas)."""
+    cols = [row[1] for row in conn.execute("PRAGMA table_info(system_log)").fetchall()]
+    cpu_cols = [c for c in cols if c.lower() in ("cpu", "cpu_usage", "cpu%", "cpu_pct", "usage_cpu")]
+    if not cpu_cols:
+        cpu_cols = [c for c in cols if "cpu" in c.lower()]
+    if not cpu_cols:
+        raise ValueError("No CPU column found in system_log")
+    cpu = f'"{cpu_cols[0]}"'
+    # Mirror pd.to_numeric(errors="coerce"): non-numeric values are ignored
+    numeric = f"typeof({cpu}) IN ('integer', 'real')"
+
+    total, avg_cpu, max_cpu, over_90 = conn.execute(
+        f"SELECT COUNT(*), AVG(CASE WHEN {numeric} THEN {cpu} END), "
+        f"MAX(CASE WHEN {numeric} THEN {cpu} END), "
+        f"SUM(CASE WHEN {numeric} AND {cpu} > 90 THEN 1 ELSE 0 END) FROM system_log"
+    ).fetchone()
+    peaks = [float(r[0]) for r in conn.execute(
+        f"SELECT {cpu} FROM system_log WHERE {numeric} ORDER BY {cpu} DESC LIMIT 3"
+    )]
+
+    net_cols = [c for c in cols if "network" in c.lower() or "status" == c.lower()]
+    net_down_count = 0
+    if net_cols:
+        net_down_count = conn.execute(
+            f'SELECT COUNT(*) FROM system_log WHERE lower(CAST("{net_cols[0]}" AS TEXT)) LIKE \'%down%\''
+        ).fetchone()[0]
+
+    return format_summary(
+        total,
+        float(avg_cpu) if avg_cpu is not None else 0.0,
+        float(max_cpu) if max_cpu is not None else 0.0,
+        net_down_count,
+        peaks,
+        over_90 or 0,
+        Leaderboard().refresh(conn).summary_lines(),
+    ), over_90 or 0
+
 def send_email_alert(message):
     # Simulate sending an email. If SMTP env vars are configured, attempt send.
     smtp_host = os.environ.get("SMTP_HOST")
@@ -87,6 +158,9 @@ def send_email_alert(message):
     # If SMTP details present, try to send a real email (best-effort)
     if smtp_host and smtp_port and smtp_user and smtp_pass:
         try:
+            import smtplib
+            from email.mime.text import MIMEText
+
             msg = MIMEText(message)
             msg["Subject"] = "CPU Alert"
             msg["From"] = smtp_user
@@ -100,22 +174,32 @@ def send_email_alert(message):
         except Exception as e:
             print(f"Failed to send SMTP email: {e}")
 
-if __name__ == "__main__":
-    df = load_data()
-    if df is not None:
-        try:
-            counts = count_high_cpu(df)
-            summary = generate_summary(df)
+def run_summary(send_alert=True, summary_file="summary.txt"):
+    """Writes summary.txt from log.db and fires the CPU alert if needed."""
+    if not os.path.exists(DB_NAME):
+        print("Database not found. Please ensure log.db exists.")
+        return None
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        migrate_db(conn)
+        summary, over_90 = summarize_db(conn)
+    finally:
+        conn.close()
 
-            # Print summary to console
-            print(summary)
+    # Print summary to console
+    print(summary)
 
-            # Save summary to file
-            with open("summary.txt", "w", encoding="utf-8") as f:
-                f.write(summary)
+    # Save summary to file
+    with open(summary_file, "w", encoding="utf-8") as f:
+        f.write(summary)
 
-            # Simulate/send email if any record >90
-            if counts[">90"] > 0:
-                send_email_alert(summary)
-        except Exception as e:
-            print(f"Error generating summary: {e}")
+    # Simulate/send email if any record >90
+    if send_alert and over_90 > 0:
+        send_email_alert(summary)
+    return summary
+
+if __name__ == "__main__":
+    try:
+        run_summary()
+    except Exception as e:
+        print(f"Error generating summary: {e}")
@@ -0,0 +1,186 @@
+import numpy as np
+
+TABLE_NAME = "system_log"
+PAGE_SIZE = 50
+# Pages kept on either side of the visible one, so page turns are served from memory
+PREFETCH_PAGES = 2
+# Most points a time-series chart is sent
+CHART_POINTS = 500
+
+
+def get_columns(conn, table=TABLE_NAME):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def build_where(clauses):
+    """Joins (sql, params) clauses into a single WHERE fragment."""
+    clauses = [c for c in clauses if c]
+    if not clauses:
+        return "", ()
+    sql = " AND ".join(f"({c[0]})" for c in clauses)
+    params = tuple(p for c in clauses for p in c[1])
+    return f"WHERE {sql}", params
+
+
+def count_rows(conn, where="", params=()):
+    return conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME} {where}", params).fetchone()[0]
+
+
+def latest_id(conn):
+    """Largest id in system_log; changes whenever rows are added or the table is recreated."""
+    return conn.execute(f"SELECT MAX(id) FROM {TABLE_NAME}").fetchone()[0]
+
+
+def time_bounds(conn, where="", params=()):
+    """(oldest, newest) timestamp of the matching rows."""
+    return conn.execute(
+        f"SELECT MIN(timestamp), MAX(timestamp) FROM {TABLE_NAME} {where}", params
+    ).fetchone()
+
+
+def epoch_bounds(conn, where="", params=()):
+    """(oldest, newest) timestamp of the matching rows in epoch seconds, ignoring
+    timestamps SQLite can't parse."""
+    valid = "strftime('%s', timestamp) IS NOT NULL"
+    where = f"{where} AND {valid}" if where else f"WHERE {valid}"
+    # Separate MIN and MAX subqueries can each walk the timestamp index
+    return conn.execute(
+        f"SELECT CAST(strftime('%s', (SELECT MIN(timestamp) FROM {TABLE_NAME} {where})) AS INTEGER), "
+        f"CAST(strftime('%s', (SELECT MAX(timestamp) FROM {TABLE_NAME} {where})) AS INTEGER)",
+        tuple(params) * 2,
+    ).fetchone()
+
+
+def bucket_width(first, last, points=CHART_POINTS):
+    """Seconds per bucket so [first, last] fits in at most `points` buckets."""
+    return max(1, -(-(last - first + 1) // points))
+
+
+def bucketed_averages(conn, columns, where="", params=(), points=CHART_POINTS):
+    """Averages of `columns` over at most `points` equal time buckets of the matching
+    rows, so a chart gets a few hundred points instead of every row.
+
+    Returns (bucket start epoch seconds, averages...) rows, oldest first.
+    """
+    epoch = "CAST(strftime('%s', timestamp) AS INTEGER)"
+    first, last = epoch_bounds(conn, where, params)
+    if first is None or last is None:
+        return []
+    width = bucket_width(first, last, points)
+    averages = ", ".join(f"AVG({c})" for c in columns)
+    return conn.execute(
+        f"SELECT ({epoch} / ?) * ? AS bucket, {averages} FROM {TABLE_NAME} {where} "
+        f"GROUP BY bucket HAVING bucket IS NOT NULL ORDER BY bucket",
+        (width, width) + tuple(params),
+    ).fetchall()
+
+
+def bucketed_totals(conn, columns, where, params, first, width, n_buckets):
+    """Per-bucket sums and non-NULL counts of `columns` for the matching rows, with
+    bucket i starting at first + i * width, so they can be added to totals from
+    another source (blockstore.bucket_totals). Returns (sums, counts) arrays of
+    shape (len(columns), n_buckets)."""
+    epoch = "CAST(strftime('%s', timestamp) AS INTEGER)"
+    totals = ", ".join(f"TOTAL({c}), COUNT({c})" for c in columns)
+    sums = np.zeros((len(columns), n_buckets))
+    counts = np.zeros((len(columns), n_buckets), dtype=np.int64)
+    rows = conn.execute(
+        f"SELECT ({epoch} - ?) / ? AS bucket, {totals} FROM {TABLE_NAME} {where} "
+        f"GROUP BY bucket HAVING bucket >= 0 AND bucket < ?",
+        (first, width) + tuple(params) + (n_buckets,),
+    ).fetchall()
+    for bucket, *values in rows:
+        sums[:, bucket] = values[0::2]
+        counts[:, bucket] = values[1::2]
+    return sums, counts
+
+
+def fetch_after(conn, where, params, after=None, descending=True, limit=PAGE_SIZE):
+    """Fetches up to `limit` rows ordered by (timestamp, id), strictly after the `after` key.
+
+    As in SQLite's own ordering, rows with a NULL timestamp come last when
+    descending and first when ascending. They are read as a separate segment
+    ordered by id, because a (timestamp, id) comparison with NULL is never true.
+    """
+    direction = "DESC" if descending else "ASC"
+    op = "<" if descending else ">"
+    base = [(where[len("WHERE "):], params)] if where else []
+    cols, rows = None, []
+    for undated in ((False, True) if descending else (True, False)):
+        if after is None:
+            key = None
+        elif (after[0] is None) == undated:
+            # The segment the last key is in: continue after it
+            key = ("id " + op + " ?", (after[1],)) if undated else (f"(timestamp, id) {op} (?, ?)", after)
+        elif undated == descending:
+            # The segment after the last key's one: read it from the start
+            key = None
+        else:
+            continue
+        null_check = "timestamp IS NULL" if undated else "timestamp IS NOT NULL"
+        order = f"id {direction}" if undated else f"timestamp {direction}, id {direction}"
+        sql_where, sql_params = build_where(base + [(null_check, ()), key])
+        cur = conn.execute(
+            f"SELECT * FROM {TABLE_NAME} {sql_where} ORDER BY {order} LIMIT ?",
+            sql_params + (limit - len(rows),),
+        )
+        cols = [d[0] for d in cur.description]
+        rows += cur.fetchall()
+        if len(rows) >= limit:
+            break
+    return cols, rows
+
+
+class KeysetPager:
+    """Server-side pager over system_log, keyed on (timestamp, id).
+
+    Only the pages around the current one are held in memory; earlier pages
+    are re-read from their recorded start key when the user navigates back.
+    """
+
+    def __init__(self, where="", params=(), descending=True, page_size=PAGE_SIZE):
+        self.where = where
+        self.params = tuple(params)
+        self.descending = descending
+        self.page_size = page_size
+        self.columns = []
+        self.total = None
+        # starts[n] is the key the n-th page begins after (None for the first page)
+        self.starts = [None]
+        self.pages = {}
+
+    def page_count(self):
+        if not self.total:
+            return 1
+        return (self.total + self.page_size - 1) // self.page_size
+
+    def get_page(self, conn, n):
+        if self.total is None:
+            self.total = count_rows(conn, self.where, self.params)
+        n = max(0, min(n, len(self.starts) - 1))
+        if n not in self.pages:
+            self._load(conn, n)
+        return self.columns, self.pages.get(n, [])
+
+    def _load(self, conn, n):
+        # One query fills the requested page plus the prefetch window after it;
+        # the extra row only tells us whether anything lies beyond the window
+        limit = self.page_size * (PREFETCH_PAGES + 1)
+        cols, rows = fetch_after(conn, self.where, self.params, self.starts[n], self.descending, limit + 1)
+        self.columns = cols
+        more = len(rows) > limit
+        rows = rows[:limit]
+        ts_idx, id_idx = cols.index("timestamp"), cols.index("id")
+        for i in range(0, max(len(rows), 1), self.page_size):
+            page_no = n + i // self.page_size
+            chunk = rows[i:i + self.page_size]
+            self.pages[page_no] = chunk
+            has_more = more or i + self.page_size < len(rows)
+            if has_more and len(self.starts) == page_no + 1:
+                self.starts.append((chunk[-1][ts_idx], chunk[-1][id_idx]))
+        for page_no in list(self.pages):
+            if abs(page_no - n) > PREFETCH_PAGES:
+                del self.pages[page_no]
+
+    def has_next(self, n):
+        return n + 1 < len(self.starts)
@@ -0,0 +1,262 @@
+"""Materialized hourly and daily summary reports.
+
+materialize() writes one row per closed hour and day into the `reports`
+table, only aggregating the periods closed since its last run. Each report
+stores mergeable parts (counts, sums, maxima, alert counts, top CPU peaks),
+so any report, the open period and the all-time summary can be served
+without rescanning system_log.
+
+Samples are bucketed by their timestamp. Each report records `max_id`, the
+highest system_log id when it was computed; a row with a larger id in an
+already materialized period arrived late, and that period is re-aggregated
+on the next materialize() (all_time_report() recomputes it on the fly).
+"""
+import heapq
+import json
+from datetime import datetime, timedelta
+
+from setup_db import issued_id
+
+TABLE_NAME = "system_log"
+REPORTS_TABLE = "reports"
+METRICS = ("cpu", "memory", "disk")
+LABELS = {"cpu": "CPU", "memory": "Memory", "disk": "Disk"}
+# Thresholds of the materialized alert counts (the Dashboard defaults)
+THRESHOLDS = {"cpu": 80, "memory": 85, "disk": 90}
+PERIODS = {
+    "hour": ("%Y-%m-%d %H:00:00", timedelta(hours=1)),
+    "day": ("%Y-%m-%d 00:00:00", timedelta(days=1)),
+}
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+TOP_PEAKS = 3
+
+
+def ensure_table(conn):
+    metric_cols = ", ".join(
+        f"{m}_count INTEGER, {m}_sum REAL, {m}_max REAL, {m}_alerts INTEGER" for m in METRICS
+    )
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {REPORTS_TABLE} (
+            period TEXT,
+            period_start TEXT,
+            rows INTEGER,
+            {metric_cols},
+            cpu_over_90 INTEGER,
+            net_down INTEGER,
+            cpu_peaks TEXT,
+            created_at TEXT,
+            max_id INTEGER,
+            PRIMARY KEY (period, period_start)
+        )
+    """)
+    cols = [row[1] for row in conn.execute(f"PRAGMA table_info({REPORTS_TABLE})").fetchall()]
+    if "max_id" not in cols:
+        conn.execute(f"ALTER TABLE {REPORTS_TABLE} ADD COLUMN max_id INTEGER")
+    conn.commit()
+
+
+def period_start(period, when):
+    fmt, _ = PERIODS[period]
+    return datetime.strptime(when.strftime(fmt), TS_FORMAT)
+
+
+def _net_column(conn):
+    cols = [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})").fetchall()]
+    net_cols = [c for c in cols if "network" in c.lower() or "status" == c.lower()]
+    return net_cols[0] if net_cols else None
+
+
+def compute_reports(conn, period, start=None, end=None):
+    """Aggregates system_log into per-period reports for start <= timestamp < end
+    (strings or datetimes; None leaves that side open). Returns dicts ordered by period."""
+    fmt, _ = PERIODS[period]
+    clauses, params = ["timestamp IS NOT NULL"], [fmt]
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start if isinstance(start, str) else start.strftime(TS_FORMAT))
+    if end is not None:
+        clauses.append("timestamp < ?")
+        params.append(end if isinstance(end, str) else end.strftime(TS_FORMAT))
+    where = " AND ".join(clauses)
+
+    net = _net_column(conn)
+    net_expr = f"""SUM(CASE WHEN lower(CAST("{net}" AS TEXT)) LIKE '%down%' THEN 1 ELSE 0 END)""" if net else "0"
+    select = ["strftime(?, timestamp) AS bucket", "COUNT(*)"]
+    agg_params = []
+    for m in METRICS:
+        select += [f"COUNT({m})", f"SUM({m})", f"MAX({m})", f"SUM(CASE WHEN {m} > ? THEN 1 ELSE 0 END)"]
+        agg_params.append(THRESHOLDS[m])
+    select += ["SUM(CASE WHEN cpu > 90 THEN 1 ELSE 0 END)", net_expr]
+    rows = conn.execute(
+        f"SELECT {', '.join(select)} FROM {TABLE_NAME} WHERE {where} GROUP BY bucket ORDER BY bucket",
+        [params[0]] + agg_params + params[1:],
+    ).fetchall()
+
+    peaks = {}
+    for bucket, cpu in conn.execute(
+        f"SELECT bucket, cpu FROM (SELECT strftime(?, timestamp) AS bucket, cpu, "
+        f"ROW_NUMBER() OVER (PARTITION BY strftime(?, timestamp) ORDER BY cpu DESC) AS rn "
+        f"FROM {TABLE_NAME} WHERE {where} AND cpu IS NOT NULL) WHERE rn <= ? ORDER BY bucket, rn",
+        [fmt] + params + [TOP_PEAKS],
+    ):
+        peaks.setdefault(bucket, []).append(cpu)
+
+    reports = []
+    for row in rows:
+        report = {"period": period, "period_start": row[0], "rows": row[1]}
+        for i, m in enumerate(METRICS):
+            count, total, peak, alerts = row[2 + 4 * i:6 + 4 * i]
+            report.update({
+                f"{m}_count": count, f"{m}_sum": total or 0.0, f"{m}_max": peak, f"{m}_alerts": alerts or 0,
+            })
+        report["cpu_over_90"] = row[-2] or 0
+        report["net_down"] = row[-1] or 0
+        report["cpu_peaks"] = peaks.get(row[0], [])
+        reports.append(report)
+    return reports
+
+
+def _materialized(conn, period):
+    """(latest period_start, highest max_id) of the materialized reports of one kind."""
+    return conn.execute(
+        f"SELECT MAX(period_start), MAX(max_id) FROM {REPORTS_TABLE} WHERE period = ?", (period,)
+    ).fetchone()
+
+
+def late_periods(conn, period, last, watermark):
+    """Starts of periods up to `last` that got rows with an id above `watermark`
+    after they were materialized. None when that can't be told (reports from
+    before max_id was recorded, or a recreated log.db): recompute them all."""
+    if watermark is None or issued_id(conn) < watermark:
+        return None
+    fmt, _ = PERIODS[period]
+    # Only the rows inserted since, found through the primary key
+    return [row[0] for row in conn.execute(
+        f"SELECT DISTINCT strftime(?, timestamp) AS bucket FROM {TABLE_NAME} "
+        "WHERE id > ? AND bucket <= ? ORDER BY bucket",
+        (fmt, watermark, last),
+    )]
+
+
+def _period_reports(conn, period, starts):
+    _, length = PERIODS[period]
+    reports = []
+    for start in starts:
+        start = datetime.strptime(start, TS_FORMAT)
+        reports += compute_reports(conn, period, start, start + length)
+    return reports
+
+
+def materialize(conn, now=None, rebuild=False):
+    """Writes reports for every closed period not materialized yet and
+    re-aggregates the ones that got late rows. Returns {period: number of
+    reports written}."""
+    ensure_table(conn)
+    now = now or datetime.now()
+    # Read before aggregating: rows inserted meanwhile count as late next time
+    max_id = issued_id(conn)
+    written = {}
+    for period, (_, length) in PERIODS.items():
+        last, watermark = _materialized(conn, period)
+        late = late_periods(conn, period, last, watermark) if last else []
+        if rebuild or late is None:
+            conn.execute(f"DELETE FROM {REPORTS_TABLE} WHERE period = ?", (period,))
+            last, late = None, []
+        start = datetime.strptime(last, TS_FORMAT) + length if last else None
+        reports = _period_reports(conn, period, late) + compute_reports(conn, period, start, period_start(period, now))
+        created = now.strftime(TS_FORMAT)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {REPORTS_TABLE} VALUES ({', '.join('?' * (8 + 4 * len(METRICS)))})",
+            [
+                (r["period"], r["period_start"], r["rows"],
+                 *[r[f"{m}_{k}"] for m in METRICS for k in ("count", "sum", "max", "alerts")],
+                 r["cpu_over_90"], r["net_down"], json.dumps(r["cpu_peaks"]), created, max_id)
+                for r in reports
+            ],
+        )
+        written[period] = len(reports)
+    conn.commit()
+    return written
+
+
+def list_reports(conn, period, limit=None):
+    """Materialized reports of one kind, newest first."""
+    ensure_table(conn)
+    cur = conn.execute(
+        f"SELECT * FROM {REPORTS_TABLE} WHERE period = ? ORDER BY period_start DESC"
+        + (" LIMIT ?" if limit else ""),
+        (period, limit) if limit else (period,),
+    )
+    cols = [d[0] for d in cur.description]
+    reports = []
+    for row in cur.fetchall():
+        report = dict(zip(cols, row))
+        report["cpu_peaks"] = json.loads(report["cpu_peaks"] or "[]")
+        reports.append(report)
+    return reports
+
+
+def current_report(conn, period, now=None):
+    """The open period so far, computed on the fly over its (indexed) time range."""
+    start = period_start(period, now or datetime.now())
+    reports = compute_reports(conn, period, start)
+    return reports[0] if reports else None
+
+
+def merge_reports(reports):
+    """Combines reports into one (weighted means, global max, merged peaks)."""
+    merged = {"rows": sum(r["rows"] for r in reports)}
+    for m in METRICS:
+        maxima = [r[f"{m}_max"] for r in reports if r[f"{m}_max"] is not None]
+        merged[f"{m}_count"] = sum(r[f"{m}_count"] for r in reports)
+        merged[f"{m}_sum"] = sum(r[f"{m}_sum"] for r in reports)
+        merged[f"{m}_max"] = max(maxima) if maxima else None
+        merged[f"{m}_alerts"] = sum(r[f"{m}_alerts"] for r in reports)
+    merged["cpu_over_90"] = sum(r["cpu_over_90"] for r in reports)
+    merged["net_down"] = sum(r["net_down"] for r in reports)
+    merged["cpu_peaks"] = heapq.nlargest(TOP_PEAKS, (p for r in reports for p in r["cpu_peaks"]))
+    return merged
+
+
+def report_table(report):
+    """(Metric, Value) rows matching the Dashboard's report table."""
+    rows = []
+    for m in METRICS:
+        avg = report[f"{m}_sum"] / report[f"{m}_count"] if report[f"{m}_count"] else 0.0
+        rows.append((f"Average {LABELS[m]}", f"{avg:.2f}%"))
+    for m in METRICS:
+        rows.append((f"{LABELS[m]} Alerts", str(report[f"{m}_alerts"])))
+    return rows
+
+
+def all_time_report(conn):
+    """All-time totals from the daily reports plus whatever they don't cover yet.
+    Days that got late rows since they were materialized are recomputed."""
+    days = list_reports(conn, "day")
+    if not days:
+        return merge_reports(compute_reports(conn, "day"))
+    last = days[0]["period_start"]
+    late = late_periods(conn, "day", last, _materialized(conn, "day")[1])
+    if late is None:
+        return merge_reports(compute_reports(conn, "day"))
+    start = datetime.strptime(last, TS_FORMAT) + PERIODS["day"][1]
+    fresh = [d for d in days if d["period_start"] not in late]
+    return merge_reports(fresh + _period_reports(conn, "day", late) + compute_reports(conn, "day", start))
+
+
+def summary_text(conn):
+    """The same text as main.py's summary.txt, served from the reports table."""
+    from leaderboard import Leaderboard
+    from main import format_summary
+
+    report = all_time_report(conn)
+    avg_cpu = report["cpu_sum"] / report["cpu_count"] if report["cpu_count"] else 0.0
+    return format_summary(
+        report["rows"],
+        avg_cpu,
+        float(report["cpu_max"]) if report["cpu_max"] is not None else 0.0,
+        report["net_down"],
+        [float(p) for p in report["cpu_peaks"]],
+        report["cpu_over_90"],
+        Leaderboard().refresh(conn).summary_lines(),
+    )
@@ -0,0 +1,223 @@
+"""Declarative data quality rules for system_log.
+
+The default rules are DEFAULT_CONFIG; an optional `rules.json` overrides
+them (see load_config()). Rules are compiled into SQL predicates. Rules that
+look at neighbouring samples (monotonic, gap, duplicate, stuck) use window
+functions partitioned per host, so every rule is evaluated by a single query
+and only violating rows come back to Python.
+
+Rule types:
+- missing:   value is NULL or blank ("column": "*" expands to every column)
+- range:     value is non-numeric or outside [min, max]
+- monotonic: timestamp goes backwards in insertion (id) order
+- gap:       more than `max_seconds` since the host's previous sample
+- duplicate: host already has a sample with the same timestamp
+- stuck:     value unchanged for `window` consecutive samples
+"""
+import copy
+import json
+import os
+
+RULES_FILE = "rules.json"
+HOST_COLUMN = "host"
+
+DEFAULT_CONFIG = {
+    "sample_size": 5,
+    "lookback_rows": 1000,
+    "rules": [
+        {"name": "missing_{column}", "type": "missing", "column": "*"},
+        {"name": "range_cpu", "type": "range", "column": "cpu", "min": 0, "max": 100},
+        {"name": "range_memory", "type": "range", "column": "memory", "min": 0, "max": 100},
+        {"name": "range_disk", "type": "range", "column": "disk", "min": 0, "max": 100},
+        {"name": "monotonic_timestamp", "type": "monotonic", "column": "timestamp"},
+        {"name": "sample_gap", "type": "gap", "column": "timestamp", "max_seconds": 600},
+        {"name": "duplicate_timestamp", "type": "duplicate", "column": "timestamp"},
+        {"name": "stuck_cpu", "type": "stuck", "column": "cpu", "window": 6},
+    ],
+}
+
+
+def load_config(path=RULES_FILE):
+    """DEFAULT_CONFIG with the overrides in `path` applied, if the file exists.
+
+    Top-level settings replace the defaults. Rules are merged by name: an
+    override only lists the fields it changes, a new name adds a rule, and
+    {"name": ..., "enabled": false} turns a default rule off.
+    """
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    if not os.path.isfile(path):
+        return config
+    with open(path, "r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    merged = {rule["name"]: rule for rule in config["rules"]}
+    for rule in overrides.pop("rules", []):
+        merged[rule["name"]] = {**merged.get(rule["name"], {}), **rule}
+    config.update(overrides)
+    config["rules"] = [rule for rule in merged.values() if rule.get("enabled", True)]
+    return config
+
+
+def _q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _row_key(cols):
+    # Insertion order: the id column, or SQLite's rowid for tables without one
+    return "id" if "id" in cols else "rowid"
+
+
+def compile_rules(config, cols):
+    """Turns rule definitions into (name, type, column, derived columns, predicate).
+
+    Derived columns are window expressions evaluated once over the table; the
+    predicate is a boolean SQL expression over the row and its derived columns.
+    Rules whose column doesn't exist in the table are skipped; without an id
+    column, rows are ordered by rowid instead.
+    """
+    key = _row_key(cols)
+    partition = f"PARTITION BY {_q(HOST_COLUMN)} " if HOST_COLUMN in cols else ""
+    time_order = f"timestamp, {key}" if "timestamp" in cols else key
+    by_time = f"OVER ({partition}ORDER BY {time_order})"
+    by_id = f"OVER ({partition}ORDER BY {key})"
+
+    compiled = []
+    for rule in config["rules"]:
+        targets = cols if rule.get("column") == "*" else [rule.get("column")]
+        for column in targets:
+            if column not in cols:
+                continue
+            name = rule["name"].format(column=column)
+            alias = f"_r{len(compiled)}"
+            c = _q(column)
+            derived = []
+            kind = rule["type"]
+            if kind == "missing":
+                pred = f"({c} IS NULL OR (typeof({c}) = 'text' AND trim({c}) = ''))"
+            elif kind == "range":
+                pred = (
+                    f"({c} IS NOT NULL AND NOT (typeof({c}) = 'text' AND trim({c}) = '') AND "
+                    f"(typeof({c}) NOT IN ('integer', 'real') OR {c} < {float(rule['min'])} "
+                    f"OR {c} > {float(rule['max'])}))"
+                )
+            elif kind == "monotonic":
+                derived.append(f"LAG({c}) {by_id} AS {alias}_prev")
+                pred = f"(julianday({c}) < julianday({alias}_prev))"
+            elif kind == "gap":
+                derived.append(f"LAG({c}) {by_time} AS {alias}_prev")
+                pred = (
+                    f"((julianday({c}) - julianday({alias}_prev)) * 86400.0 "
+                    f"> {float(rule['max_seconds'])})"
+                )
+            elif kind == "duplicate":
+                part = f"{_q(HOST_COLUMN)}, {c}" if HOST_COLUMN in cols else c
+                derived.append(f"ROW_NUMBER() OVER (PARTITION BY {part} ORDER BY {key}) AS {alias}_n")
+                pred = f"({alias}_n > 1)"
+            elif kind == "stuck":
+                window = int(rule.get("window", 6))
+                checks = []
+                for k in range(1, window):
+                    derived.append(f"LAG({c}, {k}) {by_time} AS {alias}_lag{k}")
+                    checks.append(f"{c} = {alias}_lag{k}")
+                pred = "(" + " AND ".join(checks) + ")" if checks else "0"
+            else:
+                raise ValueError(f"Unknown rule type: {kind}")
+            compiled.append({
+                "name": name,
+                "type": kind,
+                "column": column,
+                "derived": derived,
+                "predicate": pred,
+            })
+    return compiled
+
+
+def _flagged(conn, table, compiled, after_id, lookback_rows, new_rows=True, upto=None):
+    """Yields (row id, per-rule hit flags) for every flagged row.
+
+    With `after_id`, the window covers the rows after it plus `lookback_rows`
+    preceding rows (in both id and timestamp order) for context, and only the
+    rows after it (or, with new_rows=False, only the context rows) are
+    reported. `upto` leaves rows with a larger id out of the window entirely.
+    """
+    cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+    key = _row_key(cols)
+    derived = [d for r in compiled for d in r["derived"]]
+    select_w = ", ".join(["*", f"{key} AS _row_id"] + derived)
+    source, params = [], ()
+    if after_id is not None:
+        if "timestamp" in cols:
+            source.append(
+                f"{key} > ? OR timestamp >= COALESCE((SELECT timestamp FROM {table} "
+                f"WHERE timestamp < (SELECT MIN(timestamp) FROM {table} WHERE {key} > ?) "
+                f"ORDER BY timestamp DESC LIMIT 1 OFFSET ?), '')"
+            )
+            params = (after_id - lookback_rows, after_id, lookback_rows - 1)
+        else:
+            source.append(f"{key} > ?")
+            params = (after_id - lookback_rows,)
+    if upto is not None:
+        source.append(f"{key} <= ?")
+        params += (upto,)
+    source = "WHERE " + " AND ".join(f"({c})" for c in source) if source else ""
+
+    flags = ", ".join(f"COALESCE({r['predicate']}, 0)" for r in compiled)
+    any_flag = " OR ".join(f"COALESCE({r['predicate']}, 0)" for r in compiled)
+    target = ""
+    if after_id is not None:
+        target = "AND _row_id > ?" if new_rows else "AND _row_id <= ?"
+        params += (after_id,)
+    sql = (
+        f"WITH w AS (SELECT {select_w} FROM {table} {source}) "
+        f"SELECT _row_id, {flags} FROM w WHERE ({any_flag}) {target} ORDER BY _row_id"
+    )
+    for row in conn.execute(sql, params):
+        yield row[0], row[1:]
+
+
+def run_rules(conn, table, compiled, after_id=None, sample_size=5, lookback_rows=1000):
+    """Evaluates all compiled rules in one query.
+
+    With `after_id`, only rows with a larger id are checked, but window rules
+    still see the `lookback_rows` samples preceding them (in both id and
+    timestamp order) for context.
+    Returns {rule name: {"count": n, "samples": [ids]}} (rowids for tables
+    without an id column).
+    """
+    results = {r["name"]: {"count": 0, "samples": []} for r in compiled}
+    if not compiled:
+        return results
+    for row_id, hits in _flagged(conn, table, compiled, after_id, lookback_rows):
+        for rule, hit in zip(compiled, hits):
+            if hit:
+                res = results[rule["name"]]
+                res["count"] += 1
+                if len(res["samples"]) < sample_size:
+                    res["samples"].append(row_id)
+    return results
+
+
+def recheck_context(conn, table, compiled, after_id, lookback_rows=1000):
+    """Window-rule verdicts on the already validated rows that changed because of
+    the rows inserted after `after_id` (e.g. a late sample filling a gap).
+
+    Compares the `lookback_rows` context rows with and without the new rows.
+    Returns {rule name: {"added": [ids], "retracted": [ids]}} for window rules.
+    Rows further back than the lookback keep their earlier verdict.
+    """
+    window_rules = [r for r in compiled if r["derived"]]
+    if after_id is None or not window_rules:
+        return {}
+
+    def hits(upto):
+        found = {r["name"]: set() for r in window_rules}
+        for row_id, flags in _flagged(conn, table, window_rules, after_id, lookback_rows, False, upto):
+            for rule, hit in zip(window_rules, flags):
+                if hit:
+                    found[rule["name"]].add(row_id)
+        return found
+
+    before, now = hits(after_id), hits(None)
+    return {
+        name: {"added": sorted(now[name] - before[name]), "retracted": sorted(before[name] - now[name])}
+        for name in now
+    }
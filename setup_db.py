@@ -3,11 +3,46 @@ import random
 from datetime import datetime, timedelta
 
 DB_NAME = "log.db"
+HOST_COLUMN = "host"
+# Rows written before the host column existed belong to this host
+DEFAULT_HOST = "localhost"
+HOSTS = ["dc1-web-01", "dc1-app-01", "dc1-db-01"]
+SAMPLE_INTERVAL_MINUTES = 5
+# (username, password, role) seeded into new databases
+DEFAULT_USERS = [
+    ("admin", "admin123", "admin"),
+    ("user", "user123", "user")
+]
 
-def create_db():
-    conn = sqlite3.connect(DB_NAME)
+def migrate_db(conn):
+    """Brings an existing log.db up to the current schema (safe to run repeatedly)."""
     c = conn.cursor()
-    
+    cols = [row[1] for row in c.execute("PRAGMA table_info(system_log)").fetchall()]
+    if not cols:
+        return
+    if HOST_COLUMN not in cols:
+        c.execute(f"ALTER TABLE system_log ADD COLUMN {HOST_COLUMN} TEXT DEFAULT '{DEFAULT_HOST}'")
+    # Index used by the dashboard's keyset-paginated tables
+    c.execute("CREATE INDEX IF NOT EXISTS idx_system_log_ts_id ON system_log (timestamp, id)")
+    # Per-host time range scans (staleness and gap detection)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_system_log_host_ts ON system_log (host, timestamp)")
+    conn.commit()
+
+def issued_id(conn):
+    """Highest id system_log has handed out. Unlike MAX(id) it doesn't go back when
+    rows are deleted (pack --prune), only when the table is recreated."""
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'system_log'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    if row is not None:
+        return row[0]
+    return conn.execute("SELECT MAX(id) FROM system_log").fetchone()[0] or 0
+
+def create_schema(conn):
+    """Creates the system_log and users tables (safe to run repeatedly)."""
+    c = conn.cursor()
+
     # Create system_log table
     c.execute('''
         CREATE TABLE IF NOT EXISTS system_log (
@@ -15,10 +50,12 @@ def create_db():
             timestamp TEXT,
             cpu REAL,
             memory REAL,
-            disk REAL
+            disk REAL,
+            host TEXT DEFAULT 'localhost'
         )
     ''')
-    
+    migrate_db(conn)
+
     # Create users table
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -28,34 +65,44 @@ def create_db():
             role TEXT
         )
     ''')
+    conn.commit()
+
+def seed_users(conn):
+    """Inserts DEFAULT_USERS, keeping any that already exist."""
+    c = conn.cursor()
+    for username, password, role in DEFAULT_USERS:
+        try:
+            c.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password, role))
+        except sqlite3.IntegrityError:
+            pass # User already exists
+    conn.commit()
+
+def create_db():
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
     
+    create_schema(conn)
+
     # Generate dummy data for logs
     print("Generating dummy data...")
     base_time = datetime.now()
-    for i in range(50):
-        timestamp = (base_time - timedelta(minutes=i*5)).strftime('%Y-%m-%d %H:%M:%S')
-        cpu = round(random.uniform(10, 90), 1)
-        memory = round(random.uniform(20, 80), 1)
-        disk = round(random.uniform(30, 70), 1)
-        
-        c.execute("INSERT INTO system_log (timestamp, cpu, memory, disk) VALUES (?, ?, ?, ?)",
-                  (timestamp, cpu, memory, disk))
-    
-    # Insert default users
-    users = [
-        ("admin", "admin123", "admin"),
-        ("user", "user123", "user")
-    ]
+    # Oldest sample first, the order a collector would insert them in
+    for i in reversed(range(50)):
+        timestamp = (base_time - timedelta(minutes=i*SAMPLE_INTERVAL_MINUTES)).strftime('%Y-%m-%d %H:%M:%S')
+        for host in HOSTS:
+            cpu = round(random.uniform(10, 90), 1)
+            memory = round(random.uniform(20, 80), 1)
+            disk = round(random.uniform(30, 70), 1)
+
+            c.execute("INSERT INTO system_log (timestamp, cpu, memory, disk, host) VALUES (?, ?, ?, ?, ?)",
+                      (timestamp, cpu, memory, disk, host))
     
-    for username, password, role in users:
-        try:
-            c.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password, role))
-        except sqlite3.IntegrityError:
-            pass # User already exists
+    seed_users(conn)
 
     conn.commit()
     conn.close()
-    print(f"Database '{DB_NAME}' created successfully with 50 records and default users.")
+    print(f"Database '{DB_NAME}' created successfully with {50 * len(HOSTS)} records "
+          f"({len(HOSTS)} hosts) and default users.")
 
 if __name__ == "__main__":
     create_db()
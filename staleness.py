@@ -0,0 +1,115 @@
+"""Staleness and gap detection for the per-host sample stream.
+
+StalenessTracker keeps the last-seen timestamp of every host in memory. It is
+primed once from the (host, timestamp) index and then only reads rows inserted
+since the last refresh, so checking for silent hosts costs a dictionary scan.
+
+gap_segments() finds holes in the 5-minute cadence with a LAG window over the
+(host, timestamp) index, returning only the gaps.
+"""
+import threading
+from datetime import datetime
+
+import blockstore
+from setup_db import SAMPLE_INTERVAL_MINUTES, issued_id
+
+TABLE_NAME = "system_log"
+INTERVAL_SECONDS = SAMPLE_INTERVAL_MINUTES * 60
+# A host is stale once it has missed this many consecutive samples
+DEFAULT_MAX_MISSED = 3
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class StalenessTracker:
+    def __init__(self, interval_seconds=INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._reset()
+        # One tracker is shared by every dashboard session in the process
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self.last_seen = {}
+        self.last_id = 0
+
+    def observe(self, host, timestamp):
+        """Records a sample on ingest; `timestamp` is a datetime or a log.db string."""
+        if isinstance(timestamp, str):
+            timestamp = datetime.strptime(timestamp, TS_FORMAT)
+        current = self.last_seen.get(host)
+        if current is None or timestamp > current:
+            self.last_seen[host] = timestamp
+
+    def refresh(self, conn):
+        """Picks up rows inserted since the previous refresh (all rows the first time)."""
+        with self._lock:
+            # log.db was recreated: ids restarted, so every last-seen time is stale
+            if issued_id(conn) < self.last_id:
+                self._reset()
+            rows = conn.execute(
+                # Unparseable timestamps sort after real ones, so they'd win MAX()
+                f"SELECT host, MAX(CASE WHEN strftime('%s', timestamp) IS NOT NULL THEN timestamp END), "
+                f"MAX(id) FROM {TABLE_NAME} WHERE id > ? GROUP BY host",
+                (self.last_id,),
+            ).fetchall()
+            if self.last_id == 0:
+                # Rows removed by `pack --prune` only survive in the blocks
+                for host, ts in blockstore.last_seen(conn).items():
+                    self.observe(host, ts)
+            for host, ts, max_id in rows:
+                if ts is not None:
+                    self.observe(host, ts)
+                self.last_id = max(self.last_id, max_id)
+        return self
+
+    def stale_hosts(self, now=None, max_missed=DEFAULT_MAX_MISSED):
+        """Hosts silent for longer than `max_missed` intervals, most silent first."""
+        now = now or datetime.now()
+        limit = self.interval_seconds * max_missed
+        stale = []
+        for host, seen in list(self.last_seen.items()):
+            silent = (now - seen).total_seconds()
+            if silent > limit:
+                stale.append({
+                    "host": host,
+                    "last_seen": seen.strftime(TS_FORMAT),
+                    "silent_minutes": round(silent / 60, 1),
+                    "missed_intervals": int(silent // self.interval_seconds),
+                })
+        stale.sort(key=lambda r: r["silent_minutes"], reverse=True)
+        return stale
+
+
+def gap_segments(conn, start=None, end=None, hosts=None, interval_seconds=INTERVAL_SECONDS,
+                 tolerance=1.5):
+    """Returns holes where consecutive samples of a host are more than
+    `tolerance` intervals apart, as dicts ordered by host and gap start."""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp <= ?")
+        params.append(end)
+    if hosts:
+        clauses.append(f"host IN ({', '.join('?' * len(hosts))})")
+        params.extend(hosts)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    # Only the gaps leave SQLite: LAG diffs each sample against the host's previous one
+    epoch = "CAST(strftime('%s', timestamp) AS INTEGER)"
+    rows = conn.execute(
+        f"SELECT host, datetime(timestamp, '-' || delta || ' seconds'), timestamp, delta FROM ("
+        f"SELECT host, timestamp, {epoch} - LAG({epoch}) OVER (PARTITION BY host ORDER BY timestamp) AS delta "
+        f"FROM {TABLE_NAME} {where}) "
+        f"WHERE delta > ? ORDER BY host, timestamp",
+        params + [interval_seconds * tolerance],
+    ).fetchall()
+    return [
+        {
+            "host": host,
+            "gap_start": gap_start,
+            "gap_end": gap_end,
+            "duration_minutes": round(delta / 60, 1),
+            "missing_samples": int(round(delta / interval_seconds)) - 1,
+        }
+        for host, gap_start, gap_end, delta in rows
+    ]
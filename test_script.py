@@ -4,17 +4,28 @@
 Checks:
 - `log.db` existence
 - `system_log` table presence and required columns
-- Missing/empty values
-- Numeric ranges for CPU, Memory, Disk (0-100)
+- Data quality rules (rules.py, overridable in `rules.json`): missing values,
+  0-100 ranges, monotonic timestamps, sample gaps, duplicate timestamps
+  per host and stuck sensors
 - Prints summary and saves `test_report.txt`
+
+Validation is incremental: the last validated id and cumulative counters are
+checkpointed in the `validation_state` table, so each run only checks rows
+inserted since the previous one (plus, for window rules, the preceding
+`lookback_rows` rows whose verdict the new rows can change). Pass `--full` to
+re-scan everything.
 """
+import json
 import os
 import sqlite3
 import sys
 from datetime import datetime
 
+import rules
+
 DB_NAME = "log.db"
 TABLE_NAME = "system_log"
+STATE_TABLE = "validation_state"
 REQUIRED_METRICS = ["cpu", "memory", "disk"]
 REPORT_FILE = "test_report.txt"
 
@@ -43,29 +54,111 @@ def get_columns(conn, table):
     return cols
 
 
-def load_rows(conn, table):
-    cur = conn.cursor()
-    try:
-        cur.execute(f"SELECT * FROM {table}")
-        cols = [d[0] for d in cur.description]
-        rows = cur.fetchall()
-        return cols, rows
-    except Exception:
-        return [], []
-
-
-def is_empty_value(val):
-    return val is None or (isinstance(val, str) and val.strip() == "")
-
-
-def safe_float(v):
-    try:
-        return float(v)
-    except Exception:
-        return None
+def load_checkpoint(conn, table):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            last_id INTEGER,
+            counters TEXT,
+            updated_at TEXT
+        )
+    """)
+    row = conn.execute(
+        f"SELECT last_id, counters FROM {STATE_TABLE} WHERE table_name = ?", (table,)
+    ).fetchone()
+    if row is None:
+        return None, None
+    return row[0], json.loads(row[1])
+
+
+def save_checkpoint(conn, table, last_id, counters):
+    conn.execute(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} (table_name, last_id, counters, updated_at) "
+        "VALUES (?, ?, ?, ?)",
+        (table, last_id, json.dumps(counters), datetime.now().isoformat()),
+    )
+    conn.commit()
+
+
+def empty_counters():
+    return {
+        "total": 0,
+        "missing_values": 0,
+        "per_column_missing": {},
+        "invalid_cpu": 0,
+        "invalid_memory": 0,
+        "invalid_disk": 0,
+        "rules": {},
+    }
 
 
-def run_tests(save_report=True):
+def merge_counters(a, b, sample_size=5):
+    merged = empty_counters()
+    for key in merged:
+        if key == "per_column_missing":
+            cols = dict(a[key])
+            for col, n in b[key].items():
+                cols[col] = cols.get(col, 0) + n
+            merged[key] = cols
+        elif key == "rules":
+            merged_rules = {}
+            for name in list(a.get(key, {})) + [n for n in b[key] if n not in a.get(key, {})]:
+                old = a.get(key, {}).get(name, {"count": 0, "samples": []})
+                new = b[key].get(name, {"count": 0, "samples": []})
+                retracted = set(new.get("retracted", ()))
+                kept = [i for i in old["samples"] if i not in retracted]
+                merged_rules[name] = {
+                    "count": old["count"] + new["count"],
+                    "samples": (kept + new["samples"])[:sample_size],
+                }
+            merged[key] = merged_rules
+        else:
+            merged[key] = a[key] + b[key]
+    return merged
+
+
+def validate_db(conn, cols, after_id, config, sample_size):
+    # Every rule is evaluated by one SQL pass over the rows after the checkpoint
+    compiled = rules.compile_rules(config, cols)
+    if "id" in cols:
+        target = "WHERE id > ?" if after_id is not None else ""
+        params = (after_id,) if after_id is not None else ()
+        total, max_id = conn.execute(
+            f"SELECT COUNT(*), MAX(id) FROM {TABLE_NAME} {target}", params
+        ).fetchone()
+    else:
+        total, max_id = conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0], None
+    results = rules.run_rules(
+        conn, TABLE_NAME, compiled, after_id,
+        sample_size=sample_size,
+        lookback_rows=config.get("lookback_rows", 1000),
+    )
+    # New rows can change window-rule verdicts on rows validated earlier (a late
+    # sample closes a gap); count those changes so totals match a full scan
+    changes = rules.recheck_context(
+        conn, TABLE_NAME, compiled, after_id, lookback_rows=config.get("lookback_rows", 1000)
+    )
+    for name, change in changes.items():
+        res = results[name]
+        res["count"] += len(change["added"]) - len(change["retracted"])
+        res["samples"] = (res["samples"] + change["added"])[:sample_size]
+        res["retracted"] = change["retracted"]
+
+    counters = empty_counters()
+    counters["total"] = total
+    counters["rules"] = results
+    for rule in compiled:
+        count = results[rule["name"]]["count"]
+        if rule["type"] == "missing":
+            counters["missing_values"] += count
+            per_column = counters["per_column_missing"]
+            per_column[rule["column"]] = per_column.get(rule["column"], 0) + count
+        elif rule["type"] == "range" and rule["column"] in REQUIRED_METRICS:
+            counters[f"invalid_{rule['column']}"] += count
+    return counters, max_id
+
+
+def run_tests(save_report=True, full=False):
     report_lines = []
     report_lines.append("🔍 Running Full System Test...")
 
@@ -99,11 +192,30 @@ def run_tests(save_report=True):
         print("\n".join(report_lines))
         return {}
 
-    cols, rows = load_rows(conn, TABLE_NAME)
-    total = len(rows)
+    cols = get_columns(conn, TABLE_NAME)
+
+    # Resume from the checkpoint unless a full re-scan was asked for. Without an
+    # id column, or if the table was recreated behind our back, start over.
+    last_id, cumulative = load_checkpoint(conn, TABLE_NAME)
+    max_id = conn.execute(f"SELECT MAX(id) FROM {TABLE_NAME}").fetchone()[0] if "id" in cols else None
+    if full or "id" not in cols or last_id is None or (max_id or 0) < last_id:
+        last_id, cumulative = None, empty_counters()
+        mode = "full"
+    else:
+        mode = "incremental"
+
+    config = rules.load_config()
+    sample_size = config.get("sample_size", 5)
+    new, new_max_id = validate_db(conn, cols, last_id, config, sample_size)
+    cumulative = merge_counters(cumulative, new, sample_size)
 
     report_lines.append("✅ Database file found.")
-    report_lines.append(f"✅ Loaded {total} records from {TABLE_NAME}.")
+    if mode == "full":
+        report_lines.append(f"✅ Loaded {new['total']} records from {TABLE_NAME} (full scan).")
+    else:
+        report_lines.append(
+            f"✅ Loaded {new['total']} new records from {TABLE_NAME} (after id {last_id})."
+        )
 
     # Column checks
     missing_columns = [c for c in REQUIRED_METRICS if c not in cols]
@@ -112,42 +224,11 @@ def run_tests(save_report=True):
     else:
         report_lines.append("✅ Column check passed.")
 
-    # Missing or empty values
-    missing_values = 0
-    per_column_missing = {c: 0 for c in cols}
-
-    invalid_cpu = 0
-    invalid_memory = 0
-    invalid_disk = 0
-
-    for r in rows:
-        for i, v in enumerate(r):
-            if is_empty_value(v):
-                missing_values += 1
-                per_column_missing[cols[i]] = per_column_missing.get(cols[i], 0) + 1
-
-        # Validate numeric metrics if present
-        row_map = dict(zip(cols, r))
-        for metric in REQUIRED_METRICS:
-            if metric in row_map:
-                val = safe_float(row_map[metric])
-                if val is None:
-                    if not is_empty_value(row_map[metric]):
-                        # non-numeric
-                        if metric == "cpu":
-                            invalid_cpu += 1
-                        elif metric == "memory":
-                            invalid_memory += 1
-                        elif metric == "disk":
-                            invalid_disk += 1
-                else:
-                    if not (0 <= val <= 100):
-                        if metric == "cpu":
-                            invalid_cpu += 1
-                        elif metric == "memory":
-                            invalid_memory += 1
-                        elif metric == "disk":
-                            invalid_disk += 1
+    missing_values = cumulative["missing_values"]
+    per_column_missing = cumulative["per_column_missing"]
+    invalid_cpu = cumulative["invalid_cpu"]
+    invalid_memory = cumulative["invalid_memory"]
+    invalid_disk = cumulative["invalid_disk"]
 
     if missing_values == 0:
         report_lines.append("✅ No missing values detected.")
@@ -163,8 +244,25 @@ def run_tests(save_report=True):
         report_lines.append(f"  - Invalid Disk records: {invalid_disk}")
 
     # Summary
+    report_lines.append("===== Data Quality Rules =====")
+    for name, res in cumulative["rules"].items():
+        this_run = new["rules"].get(name, {"count": 0})["count"]
+        mark = "✅" if res["count"] == 0 else "❌"
+        line = f"{mark} {name}: {res['count']} violations ({this_run} this run)"
+        if res["samples"]:
+            line += f", sample ids: {res['samples']}"
+        report_lines.append(line)
+
+    report_lines.append("===== This Run =====")
+    report_lines.append(f"Mode: {mode}")
+    report_lines.append(f"New Records: {new['total']}")
+    report_lines.append(f"Missing Values: {new['missing_values']}")
+    report_lines.append(f"Invalid CPU Records: {new['invalid_cpu']}")
+    report_lines.append(f"Invalid Memory Records: {new['invalid_memory']}")
+    report_lines.append(f"Invalid Disk Records: {new['invalid_disk']}")
+
     report_lines.append("===== Test Summary =====")
-    report_lines.append(f"Total Records: {total}")
+    report_lines.append(f"Total Records: {cumulative['total']}")
     report_lines.append(f"Missing Values: {missing_values}")
     report_lines.append(f"Invalid CPU Records: {invalid_cpu}")
     report_lines.append(f"Invalid Memory Records: {invalid_memory}")
@@ -172,6 +270,10 @@ def run_tests(save_report=True):
 
     report_lines.append("\n🟢 System validation complete.")
 
+    checkpoint_id = new_max_id if new_max_id is not None else last_id
+    if checkpoint_id is not None:
+        save_checkpoint(conn, TABLE_NAME, checkpoint_id, cumulative)
+
     if save_report:
         try:
             with open(REPORT_FILE, "w", encoding="utf-8") as f:
@@ -186,18 +288,20 @@ def run_tests(save_report=True):
     conn.close()
 
     return {
-        "total": total,
+        "total": cumulative["total"],
         "missing_values": missing_values,
         "invalid_cpu": invalid_cpu,
         "invalid_memory": invalid_memory,
         "invalid_disk": invalid_disk,
         "missing_columns": missing_columns,
+        "mode": mode,
+        "new_records": new["total"],
     }
 
 
 if __name__ == "__main__":
     save = True
-    # allow optional --no-save
+    # allow optional --no-save and --full (ignore the checkpoint)
     if "--no-save" in sys.argv:
         save = False
-    run_tests(save_report=save)
+    run_tests(save_report=save, full="--full" in sys.argv)